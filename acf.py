@@ -0,0 +1,40 @@
+import numpy as np
+from scipy.fft import next_fast_len
+
+# Número máximo de desfases a calcular (None = todos, igual que np.correlate en modo 'full')
+ACF_MAX_LAG = None
+
+
+def autocovariance(values, max_lag=ACF_MAX_LAG):
+    """Lado positivo de la autocovarianza por FFT: r[k] = sum(x[t] * x[t - k]) / N para k = 0..max_lag.
+
+    Si `values` es 2-D, se calcula por columnas.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    N = len(x)
+    if N == 0:
+        return np.zeros((0,) + x.shape[1:])
+    if max_lag is None or max_lag > N - 1:
+        max_lag = N - 1
+
+    # Relleno con ceros hasta >= 2N-1 para obtener la correlación lineal y no la circular
+    nfft = next_fast_len(2 * N - 1, real=True)
+    spectrum = np.fft.rfft(x, n=nfft, axis=0)
+    return np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=nfft, axis=0)[:max_lag + 1] / N
+
+
+def compute_acf(values, max_lag=ACF_MAX_LAG):
+    """Autocovarianza de `values` por FFT, equivalente a np.correlate(x, x, mode='full') / N.
+
+    Devuelve (time_lags, acf) para los desfases -max_lag..max_lag. Si `values` es 2-D,
+    cada columna es una señal y acf tiene forma (2 * max_lag + 1, columnas).
+    """
+    r = autocovariance(values, max_lag)
+    if len(r) == 0:
+        return np.arange(0), r
+    max_lag = len(r) - 1
+
+    # La autocovarianza es simétrica: r[-k] = r[k]
+    acf = np.concatenate((r[:0:-1], r), axis=0)
+    time_lags = np.arange(-max_lag, max_lag + 1)
+    return time_lags, acf
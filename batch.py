@@ -0,0 +1,107 @@
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+from acf import ACF_MAX_LAG
+from loader import EXTENSIONS, load_loop_file
+from loop_analyzer import LoopAnalyzer
+from multiloop import analyze_loops
+from store import ResultStore, analyze_csv_incremental
+from streaming import STREAM_CHUNKSIZE, analyze_csv_streaming
+
+
+def find_loop_files(patterns):
+    """Expande directorios y patrones glob a la lista de archivos de lazos."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern)
+        files.extend(f for f in matches if f.endswith(EXTENSIONS))
+    return sorted(set(files))
+
+
+def process_file(file_name, sep=None, max_lag=ACF_MAX_LAG, cache_dir=None, stream=False,
+                 chunksize=STREAM_CHUNKSIZE, store=None):
+    """Analiza un archivo y devuelve una fila de resumen por lazo.
+
+    Con `store` (ruta de una base SQLite) los CSV se analizan por bloques retomando lo ya procesado.
+    La columna 'analysis' indica el modo: 'stream' (PSD de Welch, ACF limitada, sin diagnóstico de
+    agarre) o 'full'.
+    """
+    streaming = bool(store or stream) and file_name.endswith('.csv')
+    # Los errores se registran en la fila para que un archivo malo no detenga la auditoría
+    try:
+        analyzer = LoopAnalyzer(max_lag=max_lag)
+        if streaming and store:
+            with ResultStore(store) as result_store:
+                results, _ = analyze_csv_incremental(file_name, result_store, analyzer, sep=sep, chunksize=chunksize)
+        elif streaming:
+            results = analyze_csv_streaming(file_name, analyzer, sep=sep, chunksize=chunksize)
+        else:
+            results = analyze_loops(load_loop_file(file_name, sep=sep, cache_dir=cache_dir), analyzer=analyzer)
+        rows = [dict(result.summary(), loop=tag, error='') for tag, result in results.items()]
+    except Exception as e:
+        rows = [{'loop': '', 'error': str(e)}]
+    for row in rows:
+        row['file'] = file_name
+        row['analysis'] = 'stream' if streaming else 'full'
+    return rows
+
+
+def write_summary(rows, output):
+    summary = pd.DataFrame(rows)
+    first = [c for c in ('file', 'loop', 'analysis') if c in summary.columns]
+    summary = summary[first + [c for c in summary.columns if c not in first]]
+    if output.endswith('.parquet'):
+        summary.to_parquet(output, index=False)
+    else:
+        summary.to_csv(output, index=False)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis por lotes de archivos de lazos de control.")
+    parser.add_argument('paths', nargs='+', help="Directorios o patrones glob con archivos CSV/XLSX")
+    parser.add_argument('-o', '--output', default='resumen.csv', help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument('--sep', default=None, help="Separador de los archivos CSV (por defecto se detecta)")
+    parser.add_argument('--workers', type=int, default=None, help="Número de procesos (por defecto, todos los núcleos)")
+    parser.add_argument('--max-lag', type=int, default=ACF_MAX_LAG, help="Desfase máximo de la ACF")
+    parser.add_argument('--cache-dir', default=None, help="Directorio de caché en disco de los archivos leídos")
+    parser.add_argument('--stream', action='store_true',
+                        help="Leer los CSV por bloques con memoria acotada (espectro de Welch, ACF limitada)")
+    parser.add_argument('--chunksize', type=int, default=STREAM_CHUNKSIZE, help="Filas por bloque en modo --stream")
+    parser.add_argument('--store', default=None,
+                        help="Base SQLite de resultados: los CSV que solo crecieron se analizan desde la última fila procesada")
+    args = parser.parse_args(argv)
+
+    files = find_loop_files(args.paths)
+    if not files:
+        print("No se encontraron archivos CSV o XLSX.", file=sys.stderr)
+        return 1
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        per_file = list(executor.map(partial(process_file, sep=args.sep, max_lag=args.max_lag,
+                                             cache_dir=args.cache_dir, stream=args.stream,
+                                             chunksize=args.chunksize, store=args.store), files))
+    rows = [row for file_rows in per_file for row in file_rows]
+
+    write_summary(rows, args.output)
+    streamed = {row['file'] for row in rows if row['analysis'] == 'stream'}
+    if streamed:
+        print(f"Aviso: {len(streamed)} archivos CSV se analizaron por bloques (PSD de Welch, ACF hasta "
+              f"--max-lag, sin diagnóstico de agarre); los demás, completos. Ver la columna 'analysis'.",
+              file=sys.stderr)
+    failed = sum(1 for row in rows if row['error'])
+    print(f"{len(files)} archivos analizados ({len(rows)} filas), {failed} con errores. Resumen en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from instrumentation import StageProfiler
+from loader import clear_cache, load_loop_file
+from loop_analyzer import LoopAnalyzer
+from multiloop import VARIABLES
+from report import build_report, loop_entry, render_loop_figures
+from synthetic import KINDS, generate_loop
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+BASELINE_FILE = 'benchmark_baseline.json'
+# Etapas más cortas que esto se ignoran al comparar: su variación es ruido
+MIN_COMPARE_SECONDS = 0.01
+
+
+def build_pdf(file_name, result, figures, tmp_dir):
+    """Informe de un lazo con report.build_report, como el de report.py."""
+    images = {}
+    for name, png in figures.items():
+        path = os.path.join(tmp_dir, name + '.png')
+        with open(path, 'wb') as f:
+            f.write(png)
+        images[name] = path
+    build_report([loop_entry(file_name, '', result, images)], os.path.join(tmp_dir, 'informe.pdf'))
+
+
+def run_case(kind, N, tmp_dir, memory=False, max_lag=None, analysis_only=False):
+    data = generate_loop(kind, N)
+    file_name = os.path.join(tmp_dir, f"{kind}_{N}.csv")
+    data.to_csv(file_name, sep=';', index=False)
+    analyzer = LoopAnalyzer(max_lag=max_lag)
+    profiler = StageProfiler(memory=memory)
+
+    clear_cache()
+    with profiler.stage('load'):
+        data = load_loop_file(file_name)
+    result = analyzer.analyze(data, progress=profiler.on_progress)
+    profiler.stop()
+
+    if not analysis_only:
+        # Las mismas funciones que usa report.py para las figuras y el PDF
+        with profiler.stage('plotting'):
+            time_axis = data['Time'].to_numpy() if 'Time' in data else np.arange(len(data))
+            columns = {v: data[v].to_numpy(dtype=np.float64) for v in VARIABLES if v in data}
+            figures = render_loop_figures(time_axis, columns, result, max_lag=max_lag)
+        with profiler.stage('pdf'):
+            build_pdf(file_name, result, figures, tmp_dir)
+
+    for record in profiler.records:
+        record.update(kind=kind, N=N)
+    return profiler.records
+
+
+def compare(records, baseline, tolerance):
+    regressions = []
+    for record in records:
+        key = f"{record['kind']}|{record['N']}|{record['stage']}"
+        reference = baseline.get(key)
+        if reference is None or max(reference, record['wall_s']) < MIN_COMPARE_SECONDS:
+            continue
+        if record['wall_s'] > reference * (1 + tolerance):
+            regressions.append((key, reference, record['wall_s']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del análisis con lazos sintéticos.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="Número de muestras (hasta 10^7)")
+    parser.add_argument('--kinds', nargs='+', default=KINDS, choices=KINDS, help="Tipos de lazo sintético")
+    parser.add_argument('--max-lag', type=int, default=None, help="Desfase máximo de la ACF")
+    parser.add_argument('--analysis-only', action='store_true', help="Omitir las etapas de gráficos y PDF")
+    parser.add_argument('--memory', action='store_true',
+                        help="Medir la memoria máxima por etapa con tracemalloc (hace más lentas las etapas en Python)")
+    parser.add_argument('--output', help="Guardar los resultados en JSON")
+    parser.add_argument('--save-baseline', action='store_true', help=f"Guardar los tiempos en {BASELINE_FILE}")
+    parser.add_argument('--compare', action='store_true', help=f"Comparar con {BASELINE_FILE}")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Archivo de línea base")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Aumento de tiempo tolerado (0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+
+    records = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for N in args.sizes:
+            for kind in args.kinds:
+                case = run_case(kind, N, tmp_dir, memory=args.memory,
+                                max_lag=args.max_lag, analysis_only=args.analysis_only)
+                for r in case:
+                    rss = f"  RSS {r['rss_mb']:>8.1f} MB (+{r['rss_growth_mb']:.1f})" if r['rss_mb'] is not None else ""
+                    memory = f"{r['peak_mb']:>10.1f} MB" if r['peak_mb'] is not None else ""
+                    print(f"{r['kind']:<12}{r['N']:>10}  {r['stage']:<11}{r['wall_s']:>10.4f} s"
+                          f"  CPU {r['cpu_s']:>8.4f} s{rss}{memory}", flush=True)
+                records.extend(case)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(records, f, indent=2)
+
+    timings = {f"{r['kind']}|{r['N']}|{r['stage']}": r['wall_s'] for r in records}
+    if args.save_baseline:
+        # tracemalloc hace más lentas las etapas: el modo queda guardado con los tiempos
+        with open(args.baseline, 'w') as f:
+            json.dump({'memory': args.memory, 'timings': timings}, f, indent=2, sort_keys=True)
+        print(f"Línea base guardada en {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if 'timings' not in baseline:
+            print(f"{args.baseline} no indica si se midió con --memory; vuelva a generarla con --save-baseline.",
+                  file=sys.stderr)
+            return 2
+        if baseline['memory'] != args.memory:
+            mode = "con" if baseline['memory'] else "sin"
+            print(f"La línea base se midió {mode} --memory; compare en el mismo modo.", file=sys.stderr)
+            return 2
+        regressions = compare(records, baseline['timings'], args.tolerance)
+        for key, reference, current in regressions:
+            print(f"REGRESIÓN {key}: {reference:.4f} s -> {current:.4f} s")
+        if regressions:
+            return 1
+        print("Sin regresiones respecto de la línea base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
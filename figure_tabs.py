@@ -0,0 +1,186 @@
+from PyQt5.QtWidgets import QTabWidget, QVBoxLayout, QWidget
+
+# Pestañas disponibles: nombre -> (rótulo de la pestaña, título, eje x, eje y)
+TABS = {
+    'variables_vs_tiempo': ("Variables", 'Variables del proceso vs Tiempo', 'Tiempo', 'Valor'),
+    'error_absoluto': ("Error absoluto", 'Error Absoluto a lo Largo del Tiempo', 'Tiempo', 'Error Absoluto'),
+    'espectro_potencia': ("Espectro", 'Espectro de Potencia y Detección de Picos', 'Frecuencia', 'Potencia'),
+    'autocovarianza': ("Autocovarianza", 'Autocovarianza en el Dominio del Tiempo', 'Desfase', 'Autocovarianza'),
+}
+VARIABLE_COLORS = {'PV': 'blue', 'SP': 'red', 'OP': 'green', 'Error': 'orange'}
+# Pestañas con las curvas superpuestas de varios archivos del espacio de trabajo
+COMPARISON_TABS = {
+    'comparacion_pv': ("Comparación PV", 'PV de los archivos comparados', 'Tiempo', 'PV'),
+    'comparacion_psd': ("Comparación espectro", 'PSD de Welch de PV', 'Frecuencia (Hz)', 'Potencia'),
+}
+
+
+class _PlotTab(QWidget):
+    """Una figura de Matplotlib embebida, con su barra de navegación."""
+
+    def __init__(self, title, xlabel, ylabel):
+        # Matplotlib se importa con la primera pestaña, no al abrir la ventana
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT
+        from matplotlib.figure import Figure
+
+        super().__init__()
+        self.figure = Figure(figsize=(10, 5))
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.toolbar = NavigationToolbar2QT(self.canvas, self)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.toolbar)
+        layout.addWidget(self.canvas)
+        self.ax = self.figure.add_subplot()
+        self.ax.set(title=title, xlabel=xlabel, ylabel=ylabel)
+        self.ax.grid(True)
+        self.artists = None
+        self.cursor = None
+
+    def refresh(self, autoscale=True):
+        if autoscale:
+            self.ax.relim()
+            self.ax.autoscale_view()
+        if self.cursor is not None:
+            # Las anotaciones del archivo anterior ya no corresponden a los datos
+            for selection in list(self.cursor.selections):
+                self.cursor.remove_selection(selection)
+        # El zoom guardado por la barra de navegación era del archivo anterior
+        self.toolbar.update()
+        self.canvas.draw_idle()
+
+
+class LoopFigureTabs(QTabWidget):
+    """Figuras del análisis de un lazo en pestañas, sin ventanas bloqueantes de plt.show().
+
+    Los artistas se crean con el primer archivo; los siguientes solo reemplazan sus datos.
+    """
+
+    def __init__(self, names=tuple(TABS), parent=None):
+        super().__init__(parent)
+        self.names = names
+        self.tabs = {}
+        self._updaters = {
+            'variables_vs_tiempo': self._update_variables,
+            'error_absoluto': self._update_error,
+            'espectro_potencia': self._update_spectrum,
+            'autocovarianza': self._update_acf,
+        }
+
+    def figure(self, name):
+        return self.tabs[name].figure
+
+    def _tab(self, name, specs=TABS):
+        if name not in self.tabs:
+            label, title, xlabel, ylabel = specs[name]
+            self.tabs[name] = _PlotTab(title, xlabel, ylabel)
+            self.addTab(self.tabs[name], label)
+        return self.tabs[name]
+
+    def show_loop(self, data, result, max_lag=None):
+        import numpy as np
+
+        time_axis = np.asarray(data['Time'])
+        for name in self.names:
+            tab = self._tab(name)
+            first = tab.artists is None
+            self._updaters[name](tab, data, time_axis, result, max_lag)
+            if first:
+                self._attach_cursor(tab)
+            tab.refresh(autoscale=name != 'autocovarianza')
+
+    def show_comparison(self, entries):
+        """Superpone PV y la PSD de Welch de varias entradas del espacio de trabajo.
+
+        Las curvas de los archivos que siguen comparándose se conservan; solo se crean las nuevas
+        y se quitan las de los archivos que dejaron de compararse.
+        """
+        import numpy as np
+        from plotting import plot_decimated
+
+        for name in COMPARISON_TABS:
+            tab = self._tab(name, COMPARISON_TABS)
+            if tab.artists is None:
+                tab.artists = {}
+            current = {entry.file_name: entry for entry in entries}
+            for file_name in [f for f in tab.artists if f not in current]:
+                tab.artists.pop(file_name).remove()
+            for file_name, entry in current.items():
+                if file_name in tab.artists:
+                    continue
+                if name == 'comparacion_pv':
+                    x, y = np.asarray(entry.data['Time']), entry.data['PV']
+                else:
+                    x, y = entry.result.psd_frequencies, entry.result.psd
+                tab.artists[file_name] = plot_decimated(tab.ax, x, y, label=entry.label)
+            legend = tab.ax.get_legend()
+            if legend is not None:
+                legend.remove()
+            if tab.artists:
+                tab.ax.legend()
+            # El cursor se rehace porque cambió el conjunto de curvas
+            if tab.cursor is not None:
+                tab.cursor.remove()
+                tab.cursor = None
+            if tab.artists:
+                self._attach_cursor(tab)
+            tab.refresh()
+
+    def _attach_cursor(self, tab):
+        import mplcursors
+
+        # Las DecimatedLine se señalan por su Line2D; mplcursors muestra el valor bajo el puntero
+        tab.cursor = mplcursors.cursor([getattr(a, 'line', a) for a in tab.artists.values()], hover=True)
+
+    def _update_variables(self, tab, data, time_axis, result, max_lag):
+        from plotting import plot_decimated
+
+        variables = [v for v in VARIABLE_COLORS if v in data]
+        if tab.artists is None:
+            tab.artists = {v: plot_decimated(tab.ax, time_axis, data[v], label=v, color=VARIABLE_COLORS[v])
+                           for v in variables}
+            tab.ax.legend()
+        else:
+            for v in variables:
+                tab.artists[v].set_data(time_axis, data[v])
+
+    def _update_error(self, tab, data, time_axis, result, max_lag):
+        from plotting import plot_decimated
+
+        if tab.artists is None:
+            tab.artists = {'error': plot_decimated(tab.ax, time_axis, result.absolute_error,
+                                                   marker='o', linestyle='-')}
+        else:
+            tab.artists['error'].set_data(time_axis, result.absolute_error)
+
+    def _update_spectrum(self, tab, data, time_axis, result, max_lag):
+        import numpy as np
+        from plotting import plot_decimated
+
+        power_spectrum = result.power_spectrum
+        indices = np.arange(len(power_spectrum))
+        if tab.artists is None:
+            tab.artists = {
+                'spectrum': plot_decimated(tab.ax, indices, power_spectrum, label='Espectro de Potencia'),
+                'peaks': tab.ax.plot([], [], 'ro', label='Picos')[0],
+            }
+            tab.ax.legend()
+        else:
+            tab.artists['spectrum'].set_data(indices, power_spectrum)
+        tab.artists['peaks'].set_data(result.peaks, power_spectrum[result.peaks])
+
+    def _update_acf(self, tab, data, time_axis, result, max_lag):
+        from plotting import plot_acf, update_acf
+
+        if tab.artists is None:
+            tab.artists = {
+                'acf': plot_acf(tab.ax, result.time_lags, result.acf, max_lag=max_lag),
+                'threshold': tab.ax.axhline(y=result.umbral_acf, color='r', linestyle='--'),
+            }
+        else:
+            update_acf(tab.artists['acf'], result.time_lags, result.acf, max_lag=max_lag)
+        threshold = tab.artists['threshold']
+        threshold.set_ydata([result.umbral_acf, result.umbral_acf])
+        threshold.set_label(f'Umbral ACF ({result.umbral_acf})')
+        threshold.set_visible(result.perturbations_ACF)
+        legend = tab.ax.legend(handles=[threshold])
+        legend.set_visible(result.perturbations_ACF)
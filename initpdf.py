@@ -1,20 +1,25 @@
+import time
+STARTUP_T0 = time.perf_counter()  # Antes de los demás imports, para medir el arranque completo
 import sys
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from scipy.fftpack import fft
-from scipy.signal import find_peaks
-import mplcursors
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QFileDialog, QTextEdit
-from fpdf import FPDF
-from os.path import exists
+import os
+from io import BytesIO
+from tempfile import NamedTemporaryFile
+from instrumentation import STARTUP_EXIT, StageProfiler, format_startup, startup_record
+from worker import AnalysisWorker, preload_modules, start_worker, stop_worker
+from figure_tabs import LoopFigureTabs
+from workspace import Workspace, comparison_table
+from PyQt5.QtCore import Qt, QTimer
+# pandas, scipy, matplotlib y fpdf se importan recién al cargar un archivo o generar el informe
+# (y en segundo plano apenas aparece la ventana), así la ventana no espera a esos módulos
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QFileDialog,
+                             QTextEdit, QListWidget, QListWidgetItem, QTableWidget, QTableWidgetItem, QLabel)
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
         self.setWindowTitle("Análisis de Datos")
-        self.setGeometry(100, 100, 800, 600)
+        self.setGeometry(100, 100, 1000, 800)
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -22,22 +27,50 @@ class MainWindow(QMainWindow):
         self.layout = QVBoxLayout()
         self.central_widget.setLayout(self.layout)
 
+        # Espacio de trabajo: archivos analizados que quedan en memoria para volver a ellos al instante
+        self.workspace = Workspace()
+        self.file_list = QListWidget()
+        self.file_list.currentItemChanged.connect(self.on_file_selected)
+        self.file_list.itemChanged.connect(self.update_comparison)
+        files_panel = QVBoxLayout()
+        files_panel.addWidget(QLabel("Archivos cargados (marcar para comparar)"))
+        files_panel.addWidget(self.file_list)
+
+        self.plots = LoopFigureTabs()
+        top = QHBoxLayout()
+        top.addLayout(files_panel, stretch=1)
+        top.addWidget(self.plots, stretch=4)
+        self.layout.addLayout(top, stretch=3)
+
         self.text_edit = QTextEdit()
-        self.layout.addWidget(self.text_edit)
+        self.comparison = QTableWidget()
+        bottom = QHBoxLayout()
+        bottom.addWidget(self.text_edit, stretch=1)
+        bottom.addWidget(self.comparison, stretch=1)
+        self.layout.addLayout(bottom, stretch=1)
 
         self.load_button = QPushButton("Cargar Archivo")
         self.load_button.clicked.connect(self.load_data)
         self.layout.addWidget(self.load_button)
+
+        self.cancel_button = QPushButton("Cancelar")
+        self.cancel_button.clicked.connect(self.cancel_analysis)
+        self.cancel_button.setEnabled(False)
+        self.layout.addWidget(self.cancel_button)
         
         self.pdf_button = QPushButton("Generar Informe PDF")
         self.pdf_button.clicked.connect(self.generate_pdf_report)
         self.layout.addWidget(self.pdf_button)
 
+        self.analyzer = None  # Se crea al cargar el primer archivo
+        self.worker = None
+        self.worker_thread = None
+
         # Inicialización de atributos
         self.data = None
+        self.result = None
+        self.figures = {}  # PNG en memoria de cada figura, reutilizados por el informe
         self.IAE = None
-        self.mean_frequency = None
-        self.mean_amplitude = None
         self.perturbations_IAE = None
         self.perturbations_ACF = None
         self.mean_frequency = None
@@ -55,163 +88,231 @@ class MainWindow(QMainWindow):
 
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
-        file_name, _ = QFileDialog.getOpenFileName(self, "Seleccionar Archivo", "", "Archivos CSV (*.csv);;Archivos Excel (*.xlsx)", options=options)
+        file_name, _ = QFileDialog.getOpenFileName(self, "Seleccionar Archivo", "", "Archivos CSV (*.csv);;Archivos Excel (*.xlsx);;Archivos columnares (*.parquet *.feather *.arrow *.npy)", options=options)
         if file_name:
             self.process_data(file_name)
 
     def process_data(self, file_name):
+        from loader import EXTENSIONS, UNSUPPORTED_FORMAT, load_loop_file
+        from loop_analyzer import LoopAnalyzer
+
+        if not file_name.endswith(EXTENSIONS):
+            self.text_edit.append(UNSUPPORTED_FORMAT)
+            return
+        if self.analyzer is None:
+            self.analyzer = LoopAnalyzer()
+        if self.workspace.is_current(file_name):
+            # Ya analizado y sin cambios en disco: se muestra sin volver a leerlo
+            self.select_file(file_name)
+            return
+
+        # La carga y el análisis se ejecutan en un hilo aparte para no bloquear la ventana
+        self.worker = AnalysisWorker(file_name, load_loop_file, self.analyzer, StageProfiler())
+        self.worker.progress.connect(self.text_edit.append)
+        self.worker.finished.connect(self.on_analysis_finished)
+        self.worker.failed.connect(self.on_analysis_failed)
+        self.worker.cancelled.connect(self.on_analysis_cancelled)
+        self.set_running(True)
+        self.worker_thread = start_worker(self, self.worker)
+
+    def on_analysis_finished(self, data, result):
+        file_name, profiler = self.worker.file_name, self.worker.profiler
+        self.set_running(False)
+        for evicted in self.workspace.add(file_name, data, result):
+            self._remove_file_item(evicted)
         try:
-            if file_name.endswith('.csv'):
-                data = pd.read_csv(file_name, sep=';')
-                self.data = pd.read_csv(file_name, sep=',')
-            elif file_name.endswith('.xlsx'):
-                data = pd.read_excel(file_name)
-                self.data = pd.read_excel(file_name)
-            else:
-                self.text_edit.append("Formato de archivo no compatible. Se aceptan archivos CSV y XLSX.")
-                return
-
-            self.text_edit.append("Datos cargados correctamente:")
-            self.text_edit.append(str(data.head()))
-
-            self.visualize_data(data)
-            self.analyze_data(data)
+            with profiler.stage('plotting'):
+                self._add_file_item(file_name)
+                self.show_entry(self.workspace.get(file_name), clear=False)
+                self.update_comparison()
         except Exception as e:
             self.text_edit.append("Error al procesar los datos:")
             self.text_edit.append(str(e))
-
-    def visualize_data(self, data, save=False, filename="variables_vs_tiempo.png"):
-        plt.figure(figsize=(10, 7))
-        plt.plot(data['Time'], data['PV'], label='PV', color='blue')
-        plt.plot(data['Time'], data['SP'], label='SP', color='red')
-        plt.plot(data['Time'], data['OP'], label='OP', color='green')
-        plt.plot(data['Time'], data['Error'], label='Error', color='orange')
-        plt.title('Variables del proceso vs Tiempo')
-        plt.xlabel('Tiempo')
-        plt.ylabel('Valor')
-        plt.grid(True)
-        plt.legend()
-        if save:
-            plt.savefig(filename)
-            plt.close()
+        self.show_profile(profiler, file=file_name)
+
+    def _file_item(self, file_name):
+        for row in range(self.file_list.count()):
+            item = self.file_list.item(row)
+            if item.data(Qt.UserRole) == file_name:
+                return item
+        return None
+
+    def _add_file_item(self, file_name):
+        # Sin señales: el archivo se muestra una sola vez, al final de on_analysis_finished
+        self.file_list.blockSignals(True)
+        item = self._file_item(file_name)
+        if item is None:
+            item = QListWidgetItem(os.path.basename(file_name))
+            item.setData(Qt.UserRole, file_name)
+            item.setToolTip(file_name)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            self.file_list.addItem(item)
+        self.file_list.setCurrentItem(item)
+        self.file_list.blockSignals(False)
+
+    def _remove_file_item(self, file_name):
+        item = self._file_item(file_name)
+        if item is not None:
+            self.file_list.blockSignals(True)
+            self.file_list.takeItem(self.file_list.row(item))
+            self.file_list.blockSignals(False)
+
+    def select_file(self, file_name):
+        item = self._file_item(file_name)
+        if item is self.file_list.currentItem():
+            self.show_entry(self.workspace.get(file_name))
         else:
-            plt.show()
-
-    def analyze_data(self, data, save=False):
-        PV = data['PV']
-        SP = data['SP']
-        OP = data['OP']
-        error = data['Error']
+            self.file_list.setCurrentItem(item)
+
+    def on_file_selected(self, item, previous=None):
+        if item is not None:
+            self.show_entry(self.workspace.get(item.data(Qt.UserRole)))
+
+    def show_entry(self, entry, clear=True):
+        # Cambiar de archivo solo actualiza las figuras y el texto: no se lee ni se analiza de nuevo
+        if clear:
+            self.clear_text()
+            self.text_edit.append(f"Archivo: {entry.file_name}")
+        self.data = entry.data
+        self.figures = {}
+        self.visualize_data(entry.data, entry.result)
+        self.analyze_data(entry.data, entry.result)
+
+    def update_comparison(self, item=None):
+        # En el orden de la lista y sin tocar el orden LRU del espacio de trabajo
+        loaded = {entry.file_name: entry for entry in self.workspace}
+        entries = [loaded[self.file_list.item(row).data(Qt.UserRole)]
+                   for row in range(self.file_list.count())
+                   if self.file_list.item(row).checkState() == Qt.Checked]
+        headers, rows = comparison_table(entries)
+        self.comparison.clear()
+        self.comparison.setColumnCount(len(headers))
+        self.comparison.setRowCount(len(rows))
+        self.comparison.setHorizontalHeaderLabels(headers)
+        self.comparison.setVerticalHeaderLabels([label for label, _ in rows])
+        for i, (_, values) in enumerate(rows):
+            for j, value in enumerate(values):
+                self.comparison.setItem(i, j, QTableWidgetItem(value))
+        self.plots.show_comparison(entries)
+
+    def on_analysis_failed(self, message):
+        self.set_running(False)
+        self.text_edit.append("Error al procesar los datos:")
+        self.text_edit.append(message)
+
+    def on_analysis_cancelled(self):
+        self.set_running(False)
+        self.text_edit.append("Análisis cancelado.")
+
+    def cancel_analysis(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def set_running(self, running):
+        if not running:
+            self.worker = None
+        self.load_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+
+    def visualize_data(self, data, result):
+        # Las figuras se actualizan en las pestañas de la ventana, sin abrir ventanas que bloqueen
+        self.plots.show_loop(data, result, max_lag=self.analyzer.max_lag)
+
+    def analyze_data(self, data, result=None):
+        from metrics import format_metrics
+        from spectral import format_oscillations
+        from stiction import format_stiction
+
+        if result is None:
+            result = self.analyzer.analyze(data)
+        self.result = result
 
         # Integral del error absoluto (IAE)
-        IAE = np.sum(np.abs(PV - SP))
-        self.IAE = IAE
-        IAElim = 100
-        self.IAElim=IAElim
+        self.IAE = result.IAE
+        self.IAElim = result.IAElim
 
-        if IAE > IAElim:
+        if result.oscillating_IAE:
             self.text_edit.append("❎ -----> El proceso presenta oscilaciones significativas con el método IAE")
             self.perturbations_IAE = "El proceso presenta oscilaciones significativas"
         else:
             self.text_edit.append("✅ -----> El proceso no presenta oscilaciones significativas con el método IAE")
             self.perturbations_IAE = "El proceso no presenta oscilaciones significativas"
 
-        # Media, desviación estándar y covarianza de las variables
-        mean_PV = np.mean(PV)
-        mean_OP = np.mean(OP)
-        covariance_OP = np.cov(OP)
-        covariance_PV = np.cov(PV)
-        std_PV = np.std(PV)
-        std_OP = np.std(OP)
-        self.mean_frequency = np.mean(PV)
-        self.mean_amplitude = np.mean(OP)
-        self.covariance_OP = covariance_OP
-        self.covariance_PV = covariance_PV
-        self.std_PV = std_PV
-        self.std_OP = std_OP
-        self.mean_PV = mean_PV
-        self.mean_OP = mean_OP
-
-
-
-        self.text_edit.append(f"Desviación estándar de PV: {std_PV}")
-        self.text_edit.append(f"Desviación estándar de OP: {std_OP}")
-        self.text_edit.append(f"Covarianza de OP: {covariance_OP}")
-        self.text_edit.append(f"Covarianza de PV: {covariance_PV}")
-        self.text_edit.append(f"Media de PV: {mean_PV}")
-        self.text_edit.append(f"Media de OP: {mean_OP}")
-        self.text_edit.append(f"Valor de IAE: {IAE}")
-        self.text_edit.append(f"Límite de IAE (IAElim): {IAElim}")
-
-        # Error absoluto a lo largo del tiempo
-        absolute_error = np.abs(PV - SP)
-        plt.figure(figsize=(10, 5))
-        plt.plot(data['Time'], absolute_error, marker='o', linestyle='-')
-        plt.title('Error Absoluto a lo Largo del Tiempo')
-        plt.xlabel('Tiempo')
-        plt.ylabel('Error Absoluto')
-        plt.grid(True)
-        if save:
-            plt.savefig("error_absoluto.png")
-            plt.close()  # Cerrar la figura después de guardar
-        else:
-            plt.show()
-
-        # Calcular la transformada de Fourier
-        pv_values = data['PV'].values 
-        spectrum = fft(pv_values) 
-
-        # Calcular el espectro de potencia
-        power_spectrum = np.abs(spectrum) ** 2
-
-        # Encontrar picos en el espectro de potencia
-        peaks, _ = find_peaks(power_spectrum, distance=20)  # ajusta la distancia según tus necesidades
-
-        # Visualizar el espectro de potencia y los picos
-        plt.figure(figsize=(10, 5))
-        plt.plot(power_spectrum, label='Espectro de Potencia')
-        plt.plot(peaks, power_spectrum[peaks], 'ro', label='Picos')
-        plt.title('Espectro de Potencia y Detección de Picos')
-        plt.xlabel('Frecuencia')
-        plt.ylabel('Potencia')
-        plt.legend()
-        plt.grid(True)
-        if save:
-            plt.savefig("espectro_potencia.png")
-            plt.close()  # Cerrar la figura después de guardar
-        else:
-            plt.show()
+        # Frecuencia y amplitud medias de los picos del espectro; media, desviación estándar y covarianza de las variables
+        self.mean_frequency = result.mean_frequency
+        self.mean_amplitude = result.mean_amplitude
+        self.covariance_OP = result.covariance_OP
+        self.covariance_PV = result.covariance_PV
+        self.std_PV = result.std_PV
+        self.std_OP = result.std_OP
+        self.mean_PV = result.mean_PV
+        self.mean_OP = result.mean_OP
+
+        self.text_edit.append(f"Desviación estándar de PV: {result.std_PV}")
+        self.text_edit.append(f"Desviación estándar de OP: {result.std_OP}")
+        self.text_edit.append(f"Covarianza de OP: {result.covariance_OP}")
+        self.text_edit.append(f"Covarianza de PV: {result.covariance_PV}")
+        self.text_edit.append(f"Media de PV: {result.mean_PV}")
+        self.text_edit.append(f"Media de OP: {result.mean_OP}")
+        self.text_edit.append(f"Valor de IAE: {result.IAE}")
+        self.text_edit.append(f"Límite de IAE (IAElim): {result.IAElim}")
+
+        # ISE, ITAE, índice de Harris, índice de oscilación y recorrido de la válvula
+        for line in format_metrics(result):
+            self.text_edit.append(line)
+
+        # Agarre (stiction) de la válvula
+        for line in format_stiction(result):
+            self.text_edit.append(line)
+
+        # Oscilaciones dominantes de la PSD de Welch, ordenadas por prominencia
+        for line in format_oscillations(result.oscillations):
+            self.text_edit.append(line)
 
         # Análisis en el dominio del tiempo utilizando ACF
-        umbral_acf = 2  # Define el umbral para la autocovarianza
-
-        acf = np.correlate(PV, PV, mode='full') / len(PV)
-        time_lags = np.arange(-len(PV) + 1, len(PV))
-
-        plt.figure(figsize=(10, 5))
-        plt.stem(time_lags, acf)
-        plt.title('Autocovarianza en el Dominio del Tiempo')
-        plt.xlabel('Desfase')
-        plt.ylabel('Autocovarianza')
-        plt.grid(True)
-        if np.max(acf) > umbral_acf:
-            plt.axhline(y=umbral_acf, color='r', linestyle='--', label=f'Umbral ACF ({umbral_acf})')
-            plt.legend()
+        if result.perturbations_ACF:
             self.text_edit.append("❎ -----> Se encontraron perturbaciones utilizando ACF.")
             self.perturbations_ACF = "Se encontraron perturbaciones"
         else:
             self.text_edit.append("✅ -----> No se encontraron perturbaciones utilizando ACF.")
             self.perturbations_ACF = "No se encontraron perturbaciones"
-        if save:
-            plt.savefig("autocovarianza.png")
-            plt.close()  # Cerrar la figura después de guardar
-        else:
-            plt.show()
+
+    def _store_figures(self):
+        # Renderizar las figuras de las pestañas a PNG en memoria (con el zoom que tengan) para el informe
+        from plotting import figure_to_png
+        self.figures = {name: figure_to_png(self.plots.figure(name)) for name in self.plots.names}
 
     def clear_text(self):
         self.text_edit.clear()
 
+    def show_profile(self, profiler, **context):
+        self.text_edit.append("Tiempos por etapa:")
+        for line in profiler.report_lines():
+            self.text_edit.append(line)
+        profiler.log(**context)
+
+    def closeEvent(self, event):
+        # Un QThread destruido mientras corre aborta el proceso: primero se detiene el análisis
+        stop_worker(self.worker, self.worker_thread)
+        super().closeEvent(event)
+
+    def on_startup(self):
+        # Primera vuelta del bucle de eventos: la ventana ya está visible
+        line = format_startup(startup_record(os.path.basename(__file__), STARTUP_T0))
+        self.text_edit.append(line)
+        if STARTUP_EXIT:
+            print(line, flush=True)
+            QApplication.quit()
+        else:
+            preload_modules()
+
     def generate_pdf_report(self):
+        from fpdf import FPDF
+        from metrics import format_metrics
+        from spectral import format_oscillations
+        from stiction import format_stiction
+
         # Verifica si todos los datos necesarios están presentes
         if (self.data is None or 
             self.IAE is None or 
@@ -221,14 +322,16 @@ class MainWindow(QMainWindow):
             self.perturbations_ACF is None):
             self.text_edit.append(f"Datos de análisis:\n"
                                   f"IAE: {self.IAE}\n"
-                                  f"Media de frecuencias: {self.mean_frequency}\n Hz"
-                                  f"Media de amplitudes: {self.mean_amplitude}\n"
+                                  f"Frecuencia media de los picos: {self.mean_frequency} Hz\n"
+                                  f"Amplitud media de los picos: {self.mean_amplitude}\n"
                                   f"Perturbaciones IAE: {self.perturbations_IAE}\n"
                                   f"Perturbaciones ACF: {self.perturbations_ACF}\n")
             self.text_edit.append("No hay datos cargados para generar el informe.")
             return
 
+        profiler = StageProfiler()
         try:
+            profiler.start('pdf')
             pdf = FPDF()
 
             # Página de Datos Básicos del Análisis
@@ -239,33 +342,38 @@ class MainWindow(QMainWindow):
                         f"Covarianza de PV: {self.covariance_PV}\n"
                         f"Valor de IAE: {self.IAE}\n"
                         f"Límite de IAE (IAElim): {self.IAElim}\n"
-                        f"Media de PV: {self.mean_frequency}Hz\n "
-                        f"Media de OP: {self.mean_amplitude}\n"
+                        f"Media de PV: {self.mean_PV}\n"
+                        f"Media de OP: {self.mean_OP}\n"
+                        f"Frecuencia media de los picos: {self.mean_frequency} Hz\n"
+                        f"Amplitud media de los picos: {self.mean_amplitude}\n"
                         f"Perturbaciones IAE: {self.perturbations_IAE}\n"
-                        f"Perturbaciones ACF: {self.perturbations_ACF}\n"
+                        f"Perturbaciones ACF: {self.perturbations_ACF}\n",
+                        "\n".join(format_metrics(self.result) + format_stiction(self.result)),
             ])
 
-            # Guardar imágenes antes de agregarlas al PDF
-            self.visualize_data(self.data, save=True, filename="variables_vs_tiempo.png")
-            self.analyze_data(self.data, save=True)  # Esto debe guardar las imágenes necesarias
-
-            # Verificar si las imágenes existen
-            images = ["variables_vs_tiempo.png", "error_absoluto.png", "espectro_potencia.png", "autocovarianza.png"]
+            self._store_figures()
+            images = ["variables_vs_tiempo", "error_absoluto", "espectro_potencia", "autocovarianza"]
             for image in images:
-                if not exists(image):
+                if image not in self.figures:
                     self.text_edit.append(f"Error: La imagen {image} no se encontró.")
                     return
 
             # Agregar imágenes al PDF
-            self._generate_report_page(pdf, "Variables del Proceso vs Tiempo", "variables_vs_tiempo.png")
-            self._generate_report_page(pdf, "Error Absoluto a lo Largo del Tiempo", "error_absoluto.png")
-            self._generate_report_page(pdf, "Espectro de Potencia y Detección de Picos", "espectro_potencia.png")
-            self._generate_report_page(pdf, "Autocovarianza en el Dominio del Tiempo", "autocovarianza.png")
+            self._generate_report_page(pdf, "Variables del Proceso vs Tiempo", self.figures["variables_vs_tiempo"])
+            self._generate_report_page(pdf, "Error Absoluto a lo Largo del Tiempo", self.figures["error_absoluto"])
+            self._generate_report_page(pdf, "Espectro de Potencia y Detección de Picos", self.figures["espectro_potencia"])
+            self._generate_report_page(pdf, "Oscilaciones Dominantes (PSD de Welch)",
+                                       format_oscillations(self.result.oscillations))
+            self._generate_report_page(pdf, "Autocovarianza en el Dominio del Tiempo", self.figures["autocovarianza"])
+
+            profiler.stop()
 
             pdf_output_path = QFileDialog.getSaveFileName(self, "Guardar Informe PDF", "", "Archivos PDF (*.pdf)")[0]
             if pdf_output_path:
-                pdf.output(pdf_output_path)
+                with profiler.stage('pdf_output'):
+                    pdf.output(pdf_output_path)
                 self.text_edit.append("Informe PDF generado correctamente.")
+                self.show_profile(profiler, report=pdf_output_path)
         except Exception as e:
             self.text_edit.append(f"Error al generar el informe PDF: {str(e)}")
 
@@ -277,11 +385,27 @@ class MainWindow(QMainWindow):
             for line in content:
                 pdf.multi_cell(0, 10, txt = line)
         else:
-            pdf.image(content, x = 10, y = 20, w = 180)
+            self._add_image(pdf, content)
+
+    def _add_image(self, pdf, png):
+        from fpdf import FPDF_VERSION
+
+        # fpdf2 acepta imágenes en memoria; PyFPDF 1.7 solo acepta rutas de archivo
+        if not FPDF_VERSION.startswith('1.'):
+            pdf.image(BytesIO(png), x = 10, y = 20, w = 180)
+            return
+        # PyFPDF lee la imagen al llamar a image(), así que el archivo temporal se borra enseguida
+        with NamedTemporaryFile(suffix='.png', delete=False) as f:
+            f.write(png)
+        try:
+            pdf.image(f.name, x = 10, y = 20, w = 180)
+        finally:
+            os.remove(f.name)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    QTimer.singleShot(0, window.on_startup)
     sys.exit(app.exec_())
 
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# El pico de memoria residente (RSS) del proceso se registra siempre, es una llamada al sistema por
+# etapa; tracemalloc, que mide cada etapa por separado pero hace más lentas las que tienen mucho código
+# Python (p. ej. leer XLSX), solo se activa a pedido
+PROFILE_MEMORY = os.environ.get('ANALISIS_PROFILE_MEMORY') == '1'
+# Archivo opcional donde se agrega una línea JSON por etapa
+PROFILE_LOG = os.environ.get('ANALISIS_PROFILE_LOG')
+# Con ANALISIS_STARTUP_EXIT=1 las interfaces imprimen el tiempo de arranque y se cierran (para seguirlo en el ejecutable)
+STARTUP_EXIT = os.environ.get('ANALISIS_STARTUP_EXIT') == '1'
+
+# Nombre de etapa para cada mensaje de progreso de LoopAnalyzer
+ANALYZER_STAGES = {
+    "Calculando IAE y estadísticos...": 'statistics',
+    "Calculando espectro de potencia...": 'fft',
+    "Calculando autocovarianza...": 'acf',
+    "Calculando índices de desempeño...": 'metrics',
+    "Detectando agarre de válvula...": 'stiction',
+    "Detectando picos...": 'peaks',
+}
+
+logger = logging.getLogger('analisis.perfil')
+if PROFILE_LOG:
+    _handler = logging.FileHandler(PROFILE_LOG, encoding='utf-8')
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso desde que arrancó, en MB, o None si no se puede saber."""
+    if sys.platform == 'win32':
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 1e6
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+class StageProfiler:
+    """Tiempo de reloj, tiempo de CPU del hilo y memoria máxima de etapas consecutivas.
+
+    'rss_mb' es el pico de memoria residente del proceso al terminar la etapa y 'rss_growth_mb'
+    cuánto lo subió la etapa; 'peak_mb' (tracemalloc, solo con memory=True) es el máximo de la etapa.
+
+    Cada etapa empieza y termina en el mismo hilo; start() cierra la etapa anterior.
+    """
+
+    def __init__(self, memory=PROFILE_MEMORY):
+        self.memory = memory
+        self.records = []
+        self._stage = None
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start(self, stage):
+        self.stop()
+        self._stage = stage
+        if self.memory:
+            tracemalloc.reset_peak()
+        self._rss = peak_rss_mb()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+
+    def stop(self):
+        if self._stage is None:
+            return
+        rss = peak_rss_mb()
+        record = {
+            'stage': self._stage,
+            'wall_s': time.perf_counter() - self._wall,
+            'cpu_s': time.thread_time() - self._cpu,
+            'rss_mb': rss,
+            'rss_growth_mb': rss - self._rss if rss is not None else None,
+            'peak_mb': tracemalloc.get_traced_memory()[1] / 1e6 if self.memory else None,
+        }
+        self.records.append(record)
+        self._stage = None
+
+    @contextmanager
+    def stage(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def on_progress(self, message):
+        """Callback de progreso para LoopAnalyzer.analyze: abre la etapa correspondiente."""
+        if message in ANALYZER_STAGES:
+            self.start(ANALYZER_STAGES[message])
+
+    def report_lines(self):
+        lines = []
+        for r in self.records:
+            line = f"{r['stage']:<12}{r['wall_s'] * 1000:>10.1f} ms  CPU {r['cpu_s'] * 1000:>10.1f} ms"
+            if r['rss_mb'] is not None:
+                line += f"  RSS máx. {r['rss_mb']:>8.1f} MB (+{r['rss_growth_mb']:.1f})"
+            if r['peak_mb'] is not None:
+                line += f"  memoria máx. {r['peak_mb']:>8.1f} MB"
+            lines.append(line)
+        return lines
+
+    def log(self, **context):
+        """Escribe cada etapa como una línea JSON en el log de perfil (si está configurado)."""
+        for record in self.records:
+            logger.info(json.dumps(dict(context, **record), ensure_ascii=False))
+
+
+def process_uptime():
+    """Segundos desde que el sistema operativo creó el proceso, o None si no se puede saber.
+
+    Incluye el arranque del intérprete (y la descompresión de PyInstaller en el proceso hijo),
+    que no se ve desde el código Python.
+    """
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+        times = [wintypes.FILETIME() for _ in range(4)]
+        kernel32 = ctypes.windll.kernel32
+        if not kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), *map(ctypes.byref, times)):
+            return None
+        # FILETIME: intervalos de 100 ns desde 1601-01-01
+        created = (times[0].dwHighDateTime << 32 | times[0].dwLowDateTime) / 1e7 - 11644473600
+        return time.time() - created
+    try:
+        with open('/proc/self/stat') as f:
+            # starttime es el campo 22; se cuenta desde el paréntesis que cierra el nombre del proceso
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def startup_record(script, started):
+    """Registra en el log de perfil el tiempo hasta que la ventana está lista; `started` es perf_counter()."""
+    record = {
+        'stage': 'startup',
+        'script': script,
+        'frozen': bool(getattr(sys, 'frozen', False)),
+        'wall_s': time.perf_counter() - started,
+        'process_s': process_uptime(),
+    }
+    logger.info(json.dumps(record, ensure_ascii=False))
+    return record
+
+
+def format_startup(record):
+    line = f"Ventana lista en {record['wall_s'] * 1000:.0f} ms"
+    if record['process_s'] is not None:
+        line += f" ({record['process_s'] * 1000:.0f} ms desde el inicio del proceso)"
+    return line
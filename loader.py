@@ -0,0 +1,285 @@
+import datetime
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from multiloop import discover_loops
+
+TEXT_EXTENSIONS = ('.csv', '.xlsx')
+# Formatos columnares: se leen solo las columnas de los lazos y no pasan por la caché
+COLUMNAR_EXTENSIONS = ('.parquet', '.feather', '.arrow', '.npy')
+EXTENSIONS = TEXT_EXTENSIONS + COLUMNAR_EXTENSIONS
+UNSUPPORTED_FORMAT = "Formato de archivo no compatible. Se aceptan archivos CSV, XLSX, Parquet, Feather/Arrow y NPY."
+# Orden de las columnas de un .npy 2-D
+NPY_COLUMNS = ('Time', 'PV', 'SP', 'OP', 'Error')
+
+# Caché en memoria de DataFrames ya leídos, indexada por el hash del contenido del archivo
+MEMORY_CACHE_SIZE = 8
+# Directorio opcional para guardar en disco las tablas leídas (Feather o Parquet)
+CACHE_DIR = os.environ.get('ANALISIS_CACHE_DIR')
+CACHE_FORMAT = 'feather'
+# Copia columnar que se guarda junto a cada XLSX la primera vez que se abre; las siguientes
+# aperturas la leen en lugar de volver a interpretar el XML del libro
+XLSX_SIDECAR = os.environ.get('ANALISIS_XLSX_SIDECAR', '1') == '1'
+SIDECAR_SUFFIX = '.cache'
+# Versión del lector incluida en la clave de las cachés: al cambiar cómo se interpretan los
+# archivos, las copias guardadas por versiones anteriores dejan de usarse
+READER_VERSION = 2
+# Filas leídas entre dos consultas de cancelación al leer CSV y XLSX
+CHECK_ROWS = 20_000
+
+_memory_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def file_hash(file_name, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detect_separator(file_name):
+    """Separador de un CSV (';' o ',') a partir de su primera línea."""
+    with open(file_name, encoding='utf-8', errors='ignore') as f:
+        header = f.readline()
+    return ';' if header.count(';') > header.count(',') else ','
+
+
+def loop_columns(names):
+    """Columnas que usa el análisis: Time y las PV/SP/OP/Error de cada lazo."""
+    used = {column for variables in discover_loops(names).values() for column in variables.values()}
+    return [name for name in names if name == 'Time' or name in used]
+
+
+def _numeric_column(values):
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Celdas de texto en una columna numérica: quedan como NaN
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _time_column(values):
+    """Columna Time de un XLSX: fechas como datetime64, duraciones en segundos y números como float64."""
+    first = next((value for value in values if value is not None and value != ''), None)
+    series = pd.Series(values, dtype=object).replace('', None)
+    if isinstance(first, (datetime.datetime, datetime.date)):
+        return pd.to_datetime(series, errors='coerce').to_numpy()
+    if isinstance(first, datetime.timedelta):
+        return pd.to_timedelta(series, errors='coerce').dt.total_seconds().to_numpy(dtype=np.float64)
+    return _numeric_column(values)
+
+
+def _xlsx_rows(file_name):
+    """Filas de la primera hoja de un XLSX como secuencias de valores; las celdas vacías son None o ''.
+
+    Con python-calamine instalado se usa su lector (en Rust, mucho más rápido); si no, openpyxl en
+    modo de solo lectura, sin construir los objetos de celda ni los estilos de la hoja completa.
+    """
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        pass
+    else:
+        workbook = CalamineWorkbook.from_path(file_name)
+        try:
+            yield from workbook.get_sheet_by_index(0).iter_rows()
+        finally:
+            workbook.close()
+        return
+
+    import openpyxl
+    workbook = openpyxl.load_workbook(file_name, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_xlsx_file(file_name, check=None):
+    """Lee la primera hoja de un XLSX en streaming, solo con las columnas de los lazos.
+
+    PV, SP, OP y Error quedan como float64; Time conserva su tipo (ver _time_column). `check()` se llama cada CHECK_ROWS filas y puede lanzar una excepción para cancelar la lectura.
+    """
+    rows = _xlsx_rows(file_name)
+    try:
+        header = next(rows, ())
+        names = [name for name in header if name is not None and name != '']
+        # Sin columnas de lazo reconocibles se leen todas y el error lo informa el análisis
+        used = loop_columns(names) or names
+        indices = [list(header).index(name) for name in used]
+        columns = [[] for _ in indices]
+        for count, row in enumerate(rows, start=1):
+            if check is not None and count % CHECK_ROWS == 0:
+                check()
+            if row is None or all(value is None or value == '' for value in row):
+                continue
+            for values, i in zip(columns, indices):
+                values.append(row[i] if i < len(row) else None)
+    finally:
+        rows.close()
+    return pd.DataFrame({name: _time_column(values) if name == 'Time' else _numeric_column(values)
+                         for name, values in zip(used, columns)})
+
+
+def read_csv_file(file_name, sep=None, check=None):
+    """Lee un CSV completo; con `check` se lee por bloques y se consulta la cancelación entre bloques."""
+    sep = sep or detect_separator(file_name)
+    if check is None:
+        return pd.read_csv(file_name, sep=sep)
+    with pd.read_csv(file_name, sep=sep, chunksize=5 * CHECK_ROWS) as reader:
+        chunks = []
+        for chunk in reader:
+            check()
+            chunks.append(chunk)
+    if not chunks:
+        return pd.read_csv(file_name, sep=sep)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_columnar_file(file_name):
+    """Lee un archivo Parquet, Feather/Arrow o .npy cargando solo las columnas de los lazos.
+
+    Los .npy se abren como memmap: los datos se leen del disco a medida que se usan. Pueden ser
+    un arreglo estructurado con campos Time/PV/SP/OP/Error o un arreglo (N, 5) en ese orden.
+    """
+    if file_name.endswith('.npy'):
+        array = np.load(file_name, mmap_mode='r')
+        if array.dtype.names:
+            columns = {name: array[name] for name in loop_columns(list(array.dtype.names))}
+        elif array.ndim == 2 and array.shape[1] == len(NPY_COLUMNS):
+            columns = {name: array[:, i] for i, name in enumerate(NPY_COLUMNS)}
+        else:
+            raise ValueError(f"El archivo .npy debe tener campos {NPY_COLUMNS} o forma (N, {len(NPY_COLUMNS)}).")
+        # copy=False mantiene las columnas como vistas del memmap
+        return pd.DataFrame(columns, copy=False)
+
+    import pyarrow.ipc
+    import pyarrow.parquet
+    if file_name.endswith('.parquet'):
+        names = pyarrow.parquet.read_schema(file_name).names
+        return pd.read_parquet(file_name, columns=loop_columns(names))
+    with pyarrow.ipc.open_file(file_name) as reader:
+        names = reader.schema.names
+    return pd.read_feather(file_name, columns=loop_columns(names))
+
+
+def read_loop_file(file_name, sep=None, check=None):
+    """Lee un archivo de lazo una sola vez, sin caché (`check` como en read_xlsx_file)."""
+    if file_name.endswith('.csv'):
+        return read_csv_file(file_name, sep=sep, check=check)
+    if file_name.endswith('.xlsx'):
+        return read_xlsx_file(file_name, check=check)
+    if file_name.endswith(COLUMNAR_EXTENSIONS):
+        return read_columnar_file(file_name)
+    raise ValueError(UNSUPPORTED_FORMAT)
+
+
+def _disk_cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.{CACHE_FORMAT}")
+
+
+def _read_disk_cache(path):
+    if CACHE_FORMAT == 'parquet':
+        return pd.read_parquet(path)
+    return pd.read_feather(path)
+
+
+def _write_disk_cache(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    if CACHE_FORMAT == 'parquet':
+        data.to_parquet(tmp_path, index=False)
+    else:
+        data.reset_index(drop=True).to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def sidecar_path(file_name):
+    # La extensión no es de EXTENSIONS: batch.py no la confunde con un archivo de lazo
+    return file_name + SIDECAR_SUFFIX
+
+
+def _read_sidecar(path, key):
+    """Tabla guardada junto al XLSX, o None si falta o corresponde a otra versión del libro."""
+    import pyarrow.feather
+    table = pyarrow.feather.read_table(path)
+    if (table.schema.metadata or {}).get(b'source_hash') != key.encode():
+        return None
+    return table.to_pandas()
+
+
+def _write_sidecar(data, path, key):
+    import pyarrow
+    import pyarrow.feather
+    table = pyarrow.Table.from_pandas(data, preserve_index=False)
+    table = table.replace_schema_metadata(dict(table.schema.metadata or {}, source_hash=key))
+    tmp_path = path + '.tmp'
+    pyarrow.feather.write_feather(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_loop_file(file_name, sep=None, cache_dir=CACHE_DIR, check=None):
+    """Lee un archivo de lazo reutilizando la caché si su contenido ya fue leído.
+
+    El DataFrame devuelto puede estar compartido con la caché: no debe modificarse. `check()` se
+    llama durante la lectura de CSV y XLSX y puede lanzar una excepción para cancelarla.
+    """
+    if not file_name.endswith(EXTENSIONS):
+        raise ValueError(UNSUPPORTED_FORMAT)
+    if file_name.endswith(COLUMNAR_EXTENSIONS):
+        # Leerlos ya es más rápido que calcular el hash de todo el archivo
+        return read_columnar_file(file_name)
+
+    key = f"{file_hash(file_name)}-v{READER_VERSION}"
+    if sep is not None:
+        key += '-' + sep.encode().hex()
+
+    with _lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+
+    data = None
+    sidecar = sidecar_path(file_name) if XLSX_SIDECAR and file_name.endswith('.xlsx') else None
+    if sidecar and os.path.exists(sidecar):
+        try:
+            data = _read_sidecar(sidecar, key)
+        except (ImportError, OSError, ValueError):
+            data = None
+    path = _disk_cache_path(cache_dir, key) if cache_dir else None
+    if data is None and path and os.path.exists(path):
+        try:
+            data = _read_disk_cache(path)
+        except (ImportError, OSError, ValueError):
+            data = None
+    if data is None:
+        data = read_loop_file(file_name, sep=sep, check=check)
+        if sidecar:
+            try:
+                _write_sidecar(data, sidecar, key)
+            except (ImportError, OSError, ValueError):
+                pass
+        if path:
+            try:
+                _write_disk_cache(data, path)
+            except (ImportError, OSError, ValueError):
+                # Sin pyarrow o sin permisos de escritura se sigue solo con la caché en memoria
+                pass
+
+    with _lock:
+        _memory_cache[key] = data
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+    return data
+
+
+def clear_cache():
+    with _lock:
+        _memory_cache.clear()
@@ -0,0 +1,194 @@
+from dataclasses import dataclass, asdict
+
+import numpy as np
+from scipy.signal import find_peaks
+
+from acf import compute_acf, ACF_MAX_LAG
+from metrics import HARRIS_AR_ORDER, HARRIS_DELAY, OSCILLATION_REGULARITY, elapsed_time, performance_metrics
+from spectral import WELCH_NPERSEG, Oscillation, rank_oscillations, sampling_frequency, welch_psd
+from stats_kernel import as_float64, loop_moments
+from stiction import stiction_diagnosis
+
+# Límite de IAE y umbral de la autocovarianza usados por defecto
+IAElim = 100
+umbral_acf = 2
+
+
+@dataclass
+class LoopAnalysis:
+    """Resultado del análisis de un lazo de control."""
+    n_samples: int
+    IAE: float
+    IAElim: float
+    oscillating_IAE: bool
+    mean_PV: float
+    mean_OP: float
+    std_PV: float
+    std_OP: float
+    covariance_PV: float
+    covariance_OP: float
+    absolute_error: np.ndarray
+    power_spectrum: np.ndarray
+    peaks: np.ndarray
+    peak_frequencies: np.ndarray
+    peak_amplitudes: np.ndarray
+    mean_frequency: float
+    mean_amplitude: float
+    fs: float
+    psd_frequencies: np.ndarray
+    psd: np.ndarray
+    oscillations: list[Oscillation]
+    time_lags: np.ndarray
+    acf: np.ndarray
+    acf_max: float
+    umbral_acf: float
+    perturbations_ACF: bool
+    ISE: float
+    ITAE: float
+    IAE_per_sample: float
+    harris_index: float
+    oscillation_index: float
+    oscillation_period: float
+    regular_oscillation: bool
+    valve_travel: float
+    valve_reversals: int
+    NGI: float
+    NLI: float
+    harmonic_distortion: float
+    nonlinear: bool
+    xcorr_asymmetry: float
+    apparent_stiction: float
+    stiction_likely: bool
+
+    def summary(self):
+        """Valores escalares del análisis (una fila de resumen, sin los vectores)."""
+        row = {k: v for k, v in asdict(self).items() if not isinstance(v, (np.ndarray, list))}
+        row['n_peaks'] = len(self.peaks)
+        dominant = self.oscillations[0] if self.oscillations else None
+        row['dominant_frequency'] = dominant.frequency if dominant else float('nan')
+        row['dominant_period'] = dominant.period if dominant else float('nan')
+        return row
+
+
+class LoopAnalyzer:
+    """Cálculo de IAE, estadísticos, espectro y ACF de un lazo, sin Qt ni matplotlib."""
+
+    def __init__(self, IAElim=IAElim, umbral_acf=umbral_acf, peak_distance=20, max_lag=ACF_MAX_LAG, fs=1,
+                 nperseg=WELCH_NPERSEG, harris_delay=HARRIS_DELAY, harris_order=HARRIS_AR_ORDER):
+        self.IAElim = IAElim
+        self.umbral_acf = umbral_acf
+        self.peak_distance = peak_distance
+        self.max_lag = max_lag
+        # fs solo se usa si los datos no traen una columna Time de la que deducirla
+        self.fs = fs
+        self.nperseg = nperseg
+        # Retardo del proceso (muestras) y orden AR del índice de Harris
+        self.harris_delay = harris_delay
+        self.harris_order = harris_order
+
+    def analyze(self, data, progress=None):
+        time = data['Time'] if 'Time' in data else None
+        return self.analyze_columns(data['PV'], data['SP'], data['OP'], time=time, progress=progress)[0]
+
+    def analyze_columns(self, PV, SP, OP, time=None, progress=None):
+        """Analiza uno o varios lazos en una sola pasada vectorizada.
+
+        PV, SP y OP son arreglos (N,) o (N, lazos); devuelve un LoopAnalysis por columna.
+        `time` (la columna Time) define la frecuencia de muestreo; sin ella se usa self.fs.
+        """
+        # progress(mensaje) se llama antes de cada etapa; puede lanzar una excepción para cancelar
+        if progress is None:
+            progress = lambda message: None
+
+        PV, SP, OP = as_float64(PV), as_float64(SP), as_float64(OP)
+        N, n_loops = PV.shape
+
+        # Integral del error absoluto (IAE) y estadísticos por columna
+        progress("Calculando IAE y estadísticos...")
+        # Una pasada por bloques: el error se calcula una vez y lo comparten IAE, ISE, ITAE y los
+        # índices de desempeño
+        moments = loop_moments(PV, SP, OP)
+        error, absolute_error, IAE = moments.error, moments.absolute_error, moments.IAE
+        mean_PV, mean_OP = moments.mean_PV, moments.mean_OP
+        std_PV = np.sqrt(moments.variance('PV'))
+        std_OP = np.sqrt(moments.variance('OP'))
+        # La "covarianza" de un solo vector (np.cov) es la varianza muestral (ddof=1)
+        covariance_PV = moments.variance('PV', ddof=1)
+        covariance_OP = moments.variance('OP', ddof=1)
+
+        # Espectro de potencia: rfft por columnas y espejo para obtener el espectro de dos lados
+        progress("Calculando espectro de potencia...")
+        fs = sampling_frequency(time, default=self.fs)
+        half = np.abs(np.fft.rfft(PV, axis=0)) ** 2
+        power_spectrum = np.concatenate((half, half[1:(N + 1) // 2][::-1]), axis=0)
+        frequencies = np.fft.fftfreq(N, d=1 / fs)
+        # PSD de Welch de un lado: las oscilaciones dominantes se buscan aquí, con costo acotado
+        psd_frequencies, psd = welch_psd(PV, fs=fs, nperseg=self.nperseg)
+        oscillations = [rank_oscillations(psd_frequencies, psd[:, i]) for i in range(n_loops)]
+
+        # Autocovarianza en el dominio del tiempo
+        progress("Calculando autocovarianza...")
+        time_lags, acf = compute_acf(PV, max_lag=self.max_lag)
+        acf_max = np.max(acf, axis=0)
+
+        # ISE, ITAE, índice de Harris, índice de oscilación y recorrido de la válvula
+        progress("Calculando índices de desempeño...")
+        metrics = performance_metrics(error, absolute_error, IAE, OP, elapsed_time(time, N, fs), fs=fs,
+                                      harris_delay=self.harris_delay, harris_order=self.harris_order)
+
+        # Agarre de la válvula: bicoherencia, correlación cruzada OP-error y gráfico PV-OP, sobre el
+        # registro diezmado según el período de la oscilación dominante
+        progress("Detectando agarre de válvula...")
+        stiction = [stiction_diagnosis(PV[:, i], SP[:, i], OP[:, i],
+                                       period=oscillations[i][0].period * fs if oscillations[i] else None)
+                    for i in range(n_loops)]
+
+        progress("Detectando picos...")
+        results = []
+        for i in range(n_loops):
+            # find_peaks solo trabaja con vectores: es el único paso por lazo
+            peaks, _ = find_peaks(power_spectrum[:, i], distance=self.peak_distance)
+            peak_frequencies = frequencies[peaks]
+            peak_amplitudes = np.sqrt(power_spectrum[peaks, i])
+            # La mitad espejada del espectro repite los picos con frecuencia negativa: las medias
+            # usan solo las frecuencias positivas
+            positive = peak_frequencies > 0
+            results.append(LoopAnalysis(
+                n_samples=N,
+                IAE=float(IAE[i]),
+                IAElim=self.IAElim,
+                oscillating_IAE=bool(IAE[i] > self.IAElim),
+                mean_PV=float(mean_PV[i]),
+                mean_OP=float(mean_OP[i]),
+                std_PV=float(std_PV[i]),
+                std_OP=float(std_OP[i]),
+                covariance_PV=float(covariance_PV[i]),
+                covariance_OP=float(covariance_OP[i]),
+                absolute_error=absolute_error[:, i],
+                power_spectrum=power_spectrum[:, i],
+                peaks=peaks,
+                peak_frequencies=peak_frequencies,
+                peak_amplitudes=peak_amplitudes,
+                mean_frequency=float(np.mean(peak_frequencies[positive])) if positive.any() else float('nan'),
+                mean_amplitude=float(np.mean(peak_amplitudes[positive])) if positive.any() else float('nan'),
+                fs=fs,
+                psd_frequencies=psd_frequencies,
+                psd=psd[:, i],
+                oscillations=oscillations[i],
+                time_lags=time_lags,
+                acf=acf[:, i],
+                acf_max=float(acf_max[i]),
+                umbral_acf=self.umbral_acf,
+                perturbations_ACF=bool(acf_max[i] > self.umbral_acf),
+                ISE=float(metrics['ISE'][i]),
+                ITAE=float(metrics['ITAE'][i]),
+                IAE_per_sample=float(metrics['IAE_per_sample'][i]),
+                harris_index=float(metrics['harris_index'][i]),
+                oscillation_index=float(metrics['oscillation_index'][i]),
+                oscillation_period=float(metrics['oscillation_period'][i]),
+                regular_oscillation=bool(metrics['oscillation_index'][i] > OSCILLATION_REGULARITY),
+                valve_travel=float(metrics['valve_travel'][i]),
+                valve_reversals=int(metrics['valve_reversals'][i]),
+                **stiction[i],
+            ))
+        return results
@@ -1,9 +1,13 @@
+import time
+STARTUP_T0 = time.perf_counter()  # Antes de los demás imports, para medir el arranque completo
 import sys
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from scipy.signal import find_peaks
-import mplcursors
+import os
+from instrumentation import STARTUP_EXIT, StageProfiler, format_startup, startup_record
+from worker import AnalysisWorker, preload_modules, start_worker, stop_worker
+from figure_tabs import LoopFigureTabs
+from PyQt5.QtCore import QTimer
+# pandas, scipy, matplotlib y fpdf se importan recién al cargar un archivo o generar el informe
+# (y en segundo plano apenas aparece la ventana), así la ventana no espera a esos módulos
 from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QFileDialog, QTextEdit
 
 class MainWindow(QMainWindow):
@@ -11,7 +15,7 @@ class MainWindow(QMainWindow):
         super().__init__()
 
         self.setWindowTitle("Análisis de Datos")
-        self.setGeometry(100, 100, 800, 600)
+        self.setGeometry(100, 100, 1000, 800)
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -19,112 +23,140 @@ class MainWindow(QMainWindow):
         self.layout = QVBoxLayout()
         self.central_widget.setLayout(self.layout)
 
+        self.plots = LoopFigureTabs(('variables_vs_tiempo', 'error_absoluto'))
+        self.layout.addWidget(self.plots, stretch=3)
+
         self.text_edit = QTextEdit()
-        self.layout.addWidget(self.text_edit)
+        self.layout.addWidget(self.text_edit, stretch=1)
 
         self.load_button = QPushButton("Cargar Archivo")
         self.load_button.clicked.connect(self.load_data)
         self.layout.addWidget(self.load_button)
 
+        self.cancel_button = QPushButton("Cancelar")
+        self.cancel_button.clicked.connect(self.cancel_analysis)
+        self.cancel_button.setEnabled(False)
+        self.layout.addWidget(self.cancel_button)
+
+        self.analyzer = None  # Se crea al cargar el primer archivo
+        self.worker = None
+        self.worker_thread = None
+
     def load_data(self):
         self.clear_text()  # Limpiar el área de texto antes de cargar un nuevo archivo
 
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
-        file_name, _ = QFileDialog.getOpenFileName(self, "Seleccionar Archivo", "", "Archivos CSV (*.csv);;Archivos Excel (*.xlsx)", options=options)
+        file_name, _ = QFileDialog.getOpenFileName(self, "Seleccionar Archivo", "", "Archivos CSV (*.csv);;Archivos Excel (*.xlsx);;Archivos columnares (*.parquet *.feather *.arrow *.npy)", options=options)
         if file_name:
             self.process_data(file_name)
 
     def process_data(self, file_name):
+        from loader import EXTENSIONS, UNSUPPORTED_FORMAT, load_loop_file
+        from loop_analyzer import LoopAnalyzer
+
+        if not file_name.endswith(EXTENSIONS):
+            self.text_edit.append(UNSUPPORTED_FORMAT)
+            return
+        if self.analyzer is None:
+            self.analyzer = LoopAnalyzer()
+
+        # La carga y el análisis se ejecutan en un hilo aparte para no bloquear la ventana
+        self.worker = AnalysisWorker(file_name, load_loop_file, self.analyzer, StageProfiler())
+        self.worker.progress.connect(self.text_edit.append)
+        self.worker.finished.connect(self.on_analysis_finished)
+        self.worker.failed.connect(self.on_analysis_failed)
+        self.worker.cancelled.connect(self.on_analysis_cancelled)
+        self.set_running(True)
+        self.worker_thread = start_worker(self, self.worker)
+
+    def on_analysis_finished(self, data, result):
+        file_name, profiler = self.worker.file_name, self.worker.profiler
+        self.set_running(False)
         try:
-            if file_name.endswith('.csv'):
-                data = pd.read_csv(file_name, sep=',')
-            elif file_name.endswith('.xlsx'):
-                data = pd.read_excel(file_name)
-            else:
-                self.text_edit.append("Formato de archivo no compatible. Se aceptan archivos CSV y XLSX.")
-                return
-
-            self.text_edit.append("Datos cargados correctamente:")
-            self.text_edit.append(str(data.head()))
-
-            self.visualize_data(data)
-            self.analyze_data(data)
+            with profiler.stage('plotting'):
+                self.visualize_data(data, result)
+                self.analyze_data(data, result)
         except Exception as e:
             self.text_edit.append("Error al procesar los datos:")
             self.text_edit.append(str(e))
+        self.show_profile(profiler, file=file_name)
+
+    def on_analysis_failed(self, message):
+        self.set_running(False)
+        self.text_edit.append("Error al procesar los datos:")
+        self.text_edit.append(message)
+
+    def on_analysis_cancelled(self):
+        self.set_running(False)
+        self.text_edit.append("Análisis cancelado.")
+
+    def cancel_analysis(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def set_running(self, running):
+        if not running:
+            self.worker = None
+        self.load_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
 
-    def visualize_data(self, data):
-        plt.figure(figsize=(10, 7))
-        plt.plot(data['Time'], data['PV'], label='PV', color='blue')
-        plt.plot(data['Time'], data['SP'], label='SP', color='red')
-        plt.plot(data['Time'], data['OP'], label='OP', color='green')
-        plt.plot(data['Time'], data['Error'], label='Error', color='orange')
-        plt.title('Variables del proceso vs Tiempo')
-        plt.xlabel('Tiempo')
-        plt.ylabel('Valor')
-        plt.grid(True)
-        plt.legend()
-        plt.show()
-
-    def analyze_data(self, data):
-        PV = data['PV']
-        SP = data['SP']
-        OP = data['OP']
-        error = data['Error']
-
-        IAE = np.sum(np.abs(PV - SP))
-        IAElim = 100
-
-        if IAE > IAElim:
+    def visualize_data(self, data, result):
+        # Las figuras se actualizan en las pestañas de la ventana, sin abrir ventanas que bloqueen
+        self.plots.show_loop(data, result, max_lag=self.analyzer.max_lag)
+
+    def analyze_data(self, data, result=None):
+        from metrics import format_metrics
+        from spectral import format_oscillations
+        from stiction import format_stiction
+
+        if result is None:
+            result = self.analyzer.analyze(data)
+
+        if result.oscillating_IAE:
             self.text_edit.append("❎ -----> El proceso presenta oscilaciones significativas.")
         else:
             self.text_edit.append("✅ -----> El proceso no presenta oscilaciones significativas.")
 
-        mean_PV = np.mean(PV)
-        mean_OP = np.mean(OP)
-        covariance_OP = np.cov(OP)
-        covariance_PV = np.cov(PV)
-        std_PV = np.std(PV)
-        std_OP = np.std(OP)
-
-        self.text_edit.append(f"Desviación estándar de PV: {std_PV}")
-        self.text_edit.append(f"Desviación estándar de OP: {std_OP}")
-        self.text_edit.append(f"Covarianza de OP: {covariance_OP}")
-        self.text_edit.append(f"Covarianza de PV: {covariance_PV}")
-        self.text_edit.append(f"Media de PV: {mean_PV}")
-        self.text_edit.append(f"Media de OP: {mean_OP}")
-        self.text_edit.append(f"Valor de IAE: {IAE}")
-        self.text_edit.append(f"Límite de IAE (IAElim): {IAElim}")
-
-        absolute_error = np.abs(PV - SP)
-        plt.figure(figsize=(10, 5))
-        plt.plot(data['Time'], absolute_error, marker='o', linestyle='-')
-        plt.title('Error Absoluto a lo Largo del Tiempo')
-        plt.xlabel('Tiempo')
-        plt.ylabel('Error Absoluto')
-        plt.grid(True)
-        plt.show()
-
-        N = len(PV)
-        fs = 1
-        freq_PV = np.fft.fftfreq(N, d=1/fs)
-        fft_PV = np.fft.fft(PV)
-        amplitude_spectrum_PV = np.abs(fft_PV)
-        peaks_PV, _ = find_peaks(amplitude_spectrum_PV, height=0)
-        frequencies = freq_PV[peaks_PV]
-        amplitudes = amplitude_spectrum_PV[peaks_PV]
-        mean_frequency = np.mean(frequencies)
-        mean_amplitude = np.mean(amplitudes)
-
-        self.text_edit.append(f"Media de las frecuencias: {mean_frequency} Hz")
-        self.text_edit.append(f"Media de las amplitudes: {mean_amplitude}")
+        self.text_edit.append(f"Desviación estándar de PV: {result.std_PV}")
+        self.text_edit.append(f"Desviación estándar de OP: {result.std_OP}")
+        self.text_edit.append(f"Covarianza de OP: {result.covariance_OP}")
+        self.text_edit.append(f"Covarianza de PV: {result.covariance_PV}")
+        self.text_edit.append(f"Media de PV: {result.mean_PV}")
+        self.text_edit.append(f"Media de OP: {result.mean_OP}")
+        self.text_edit.append(f"Valor de IAE: {result.IAE}")
+        self.text_edit.append(f"Límite de IAE (IAElim): {result.IAElim}")
+
+        for line in format_oscillations(result.oscillations) + format_metrics(result) + format_stiction(result):
+            self.text_edit.append(line)
 
     def clear_text(self):
         self.text_edit.clear()
 
+    def show_profile(self, profiler, **context):
+        self.text_edit.append("Tiempos por etapa:")
+        for line in profiler.report_lines():
+            self.text_edit.append(line)
+        profiler.log(**context)
+
+    def closeEvent(self, event):
+        # Un QThread destruido mientras corre aborta el proceso: primero se detiene el análisis
+        stop_worker(self.worker, self.worker_thread)
+        super().closeEvent(event)
+
+    def on_startup(self):
+        # Primera vuelta del bucle de eventos: la ventana ya está visible
+        line = format_startup(startup_record(os.path.basename(__file__), STARTUP_T0))
+        self.text_edit.append(line)
+        if STARTUP_EXIT:
+            print(line, flush=True)
+            QApplication.quit()
+        else:
+            preload_modules()
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    QTimer.singleShot(0, window.on_startup)
     sys.exit(app.exec_())
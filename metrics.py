@@ -0,0 +1,128 @@
+import numpy as np
+
+from acf import autocovariance
+
+# Orden del modelo AR y retardo del proceso (en muestras) del índice de Harris
+HARRIS_AR_ORDER = 20
+HARRIS_DELAY = 1
+# Cruces por cero de la ACF del error usados para el índice de oscilación (10 intervalos)
+OSCILLATION_CROSSINGS = 11
+# Con regularidad > 1 la oscilación se considera significativa (Thornhill, Huang y Zhang, 2003)
+OSCILLATION_REGULARITY = 1
+
+
+def time_values(time):
+    """Columna Time como float64 (segundos desde 1970 si es de fechas), o None si no es numérica."""
+    if time is None:
+        return None
+    t = np.asarray(time)
+    if np.issubdtype(t.dtype, np.datetime64):
+        return (t - np.datetime64(0, 's')) / np.timedelta64(1, 's')
+    try:
+        return t.astype(np.float64)
+    except (TypeError, ValueError):
+        return None
+
+
+def elapsed_time(time, N, fs=1.0):
+    """Tiempo transcurrido desde la primera muestra; sin una columna Time numérica se usa k / fs."""
+    t = time_values(time)
+    if t is None or len(t) != N or N == 0:
+        return np.arange(N) / fs
+    return t - t[0]
+
+
+def harris_index(r, delay=HARRIS_DELAY, order=HARRIS_AR_ORDER):
+    """Índice de Harris sigma²_mv / sigma²_y: 1 es control de varianza mínima, cerca de 0 un mal desempeño.
+
+    Ajusta por mínimos cuadrados y[t] sobre y[t - delay], ..., y[t - delay - order + 1] con las
+    ecuaciones normales armadas a partir de la autocovarianza `r` (desfases 0.., por columnas); la
+    varianza residual es la que dejaría un controlador de varianza mínima con ese retardo. Las
+    columnas con valores no finitos (p. ej. una celda vacía en PV o SP) quedan en NaN.
+    """
+    r = np.asarray(r, dtype=np.float64)
+    r = r[:, None] if r.ndim == 1 else r
+    index = np.full(r.shape[1], np.nan)
+    order = min(order, len(r) - delay)
+    finite = np.all(np.isfinite(r), axis=0)
+    if order < 1 or not finite.any():
+        return index
+    r = r[:, finite]
+    lags = np.abs(np.subtract.outer(np.arange(order), np.arange(order)))
+    R = np.moveaxis(r[lags], -1, 0)
+    rhs = r[delay:delay + order].T
+    # pinv por lazo: una señal constante deja R singular y su índice queda en NaN
+    coefficients = np.einsum('lij,lj->li', np.linalg.pinv(R), rhs)
+    variance_mv = np.maximum(r[0] - np.sum(coefficients * rhs, axis=1), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index[finite] = np.where(r[0] > 0, variance_mv / r[0], np.nan)
+    return index
+
+
+def oscillation_index(r, fs=1.0, n_crossings=OSCILLATION_CROSSINGS):
+    """Regularidad y período de la oscilación a partir de los cruces por cero de la ACF.
+
+    Con T_p los intervalos entre cruces alternos, regularidad = media(T_p) / (3 * desvío(T_p)).
+    Devuelve (regularidad, período en unidades de tiempo) por columna; NaN con menos de 4 cruces
+    o si la columna tiene valores no finitos.
+    """
+    r = np.asarray(r, dtype=np.float64)
+    r = r[:, None] if r.ndim == 1 else r
+    regularity = np.full(r.shape[1], np.nan)
+    period = np.full(r.shape[1], np.nan)
+    negative = np.signbit(r)
+    finite = np.all(np.isfinite(r), axis=0)
+    for i in range(r.shape[1]):
+        if not finite[i]:
+            continue
+        k = np.flatnonzero(negative[1:, i] != negative[:-1, i])[:n_crossings]
+        if len(k) < 4:
+            continue
+        # Posición del cruce interpolada entre las dos muestras de signo opuesto
+        crossings = k + r[k, i] / (r[k, i] - r[k + 1, i])
+        periods = crossings[2:] - crossings[:-2]
+        spread = np.std(periods)
+        regularity[i] = np.mean(periods) / (3 * spread) if spread > 0 else np.inf
+        period[i] = np.mean(periods) / fs
+    return regularity, period
+
+
+def valve_reversals(OP):
+    """Cambios de sentido del movimiento de la válvula (los tramos sin movimiento no cuentan)."""
+    steps = np.sign(np.diff(np.asarray(OP).reshape(len(OP), -1), axis=0))
+    return np.array([np.count_nonzero(np.diff(s[s != 0])) for s in steps.T])
+
+
+def performance_metrics(error, absolute_error, IAE, OP, elapsed, fs=1.0,
+                        harris_delay=HARRIS_DELAY, harris_order=HARRIS_AR_ORDER):
+    """Índices de desempeño de uno o varios lazos a partir de arreglos compartidos (N, lazos).
+
+    `error` (SP - PV), `absolute_error` e `IAE` ya los calcula LoopAnalyzer; aquí se agregan las
+    sumas ponderadas, el recorrido de la válvula y una sola autocovarianza por FFT del error
+    centrado, que usan a la vez el índice de Harris y el índice de oscilación.
+    """
+    N = len(error)
+    r = autocovariance(error - error.mean(axis=0))
+    regularity, period = oscillation_index(r, fs=fs)
+    return {
+        'ISE': np.einsum('ij,ij->j', error, error),
+        'ITAE': elapsed @ absolute_error,
+        'IAE_per_sample': IAE / N if N else np.full(error.shape[1], np.nan),
+        'harris_index': harris_index(r, delay=harris_delay, order=harris_order),
+        'oscillation_index': regularity,
+        'oscillation_period': period,
+        'valve_travel': np.sum(np.abs(np.diff(OP, axis=0)), axis=0),
+        'valve_reversals': valve_reversals(OP),
+    }
+
+
+def format_metrics(result):
+    """Líneas de texto con los índices de desempeño de un LoopAnalysis."""
+    verdict = "oscilación regular" if result.regular_oscillation else "sin oscilación regular"
+    return [
+        f"ISE: {result.ISE:.6g}   ITAE: {result.ITAE:.6g}   IAE por muestra: {result.IAE_per_sample:.6g}",
+        f"Índice de Harris (1 = varianza mínima): {result.harris_index:.4g}",
+        f"Índice de oscilación (ACF): {result.oscillation_index:.4g} ({verdict}), "
+        f"período {result.oscillation_period:.6g}",
+        f"Recorrido de la válvula: {result.valve_travel:.6g} en {result.valve_reversals} cambios de sentido",
+    ]
@@ -0,0 +1,49 @@
+import re
+
+import numpy as np
+
+from loop_analyzer import LoopAnalyzer
+
+VARIABLES = ('PV', 'SP', 'OP', 'Error')
+# Columnas del tipo "FIC101.PV" (también "FIC101_PV" o "FIC101 PV")
+TAGGED_COLUMN = re.compile(r'^(?P<tag>.+?)[._ ](?P<var>PV|SP|OP|Error)$')
+
+
+def discover_loops(columns):
+    """Descubre los lazos de un archivo a partir de los nombres de columna.
+
+    Devuelve {tag: {'PV': columna, 'SP': columna, 'OP': columna, ...}}. Un archivo con
+    columnas PV/SP/OP sin prefijo es un único lazo con tag ''.
+    """
+    loops = {}
+    for column in columns:
+        name = str(column).strip()
+        if name in VARIABLES:
+            loops.setdefault('', {})[name] = column
+            continue
+        match = TAGGED_COLUMN.match(name)
+        if match:
+            loops.setdefault(match.group('tag'), {})[match.group('var')] = column
+    # Solo son lazos los que tienen PV, SP y OP
+    return {tag: cols for tag, cols in loops.items() if all(v in cols for v in ('PV', 'SP', 'OP'))}
+
+
+def analyze_loops(data, mapping=None, analyzer=None, progress=None):
+    """Analiza todos los lazos de `data` en una pasada vectorizada sobre arreglos 2-D.
+
+    `mapping` tiene la forma de discover_loops; si se omite, se descubre de las columnas.
+    Devuelve {tag: LoopAnalysis}.
+    """
+    if mapping is None:
+        mapping = discover_loops(data.columns)
+    if not mapping:
+        raise ValueError("No se encontraron columnas PV, SP y OP en el archivo.")
+    if analyzer is None:
+        analyzer = LoopAnalyzer()
+
+    tags = list(mapping)
+    PV, SP, OP = (data[[mapping[tag][var] for tag in tags]].to_numpy(dtype=np.float64)
+                  for var in ('PV', 'SP', 'OP'))
+    time = data['Time'] if 'Time' in data else None
+    results = analyzer.analyze_columns(PV, SP, OP, time=time, progress=progress)
+    return dict(zip(tags, results))
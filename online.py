@@ -0,0 +1,173 @@
+import argparse
+import math
+import socket
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from loop_analyzer import IAElim, umbral_acf
+
+
+@dataclass
+class WindowStatus:
+    n_samples: int
+    IAE: float
+    mean_PV: float
+    std_PV: float
+    acf_max: float
+    oscillating_IAE: bool
+    perturbations_ACF: bool
+
+
+class SlidingWindowMonitor:
+    """IAE, desviación estándar de PV y veredicto de ACF sobre las últimas `window` muestras.
+
+    Cada muestra nueva actualiza en O(1) la suma del error absoluto, la media y la suma de cuadrados
+    centrada de PV (Welford, que también permite quitar la muestra que sale de la ventana) y la suma
+    de PV², que solo usa la alarma de la ACF. Cada `window` muestras todo se recalcula para no
+    acumular error de redondeo.
+    """
+
+    def __init__(self, window, IAElim=IAElim, umbral_acf=umbral_acf):
+        if window < 1:
+            raise ValueError("La ventana debe tener al menos una muestra.")
+        self.window = window
+        self.IAElim = IAElim
+        self.umbral_acf = umbral_acf
+        self.samples = deque()
+        self.sum_abs_error = 0.0
+        self.mean_PV = 0.0
+        self.M2_PV = 0.0
+        self.sum_PV2 = 0.0
+        self._updates = 0
+
+    def update(self, PV, SP):
+        abs_error = abs(PV - SP)
+        self.samples.append((PV, abs_error))
+        self.sum_abs_error += abs_error
+        self.sum_PV2 += PV * PV
+        delta = PV - self.mean_PV
+        self.mean_PV += delta / len(self.samples)
+        self.M2_PV += delta * (PV - self.mean_PV)
+        if len(self.samples) > self.window:
+            old_PV, old_abs_error = self.samples.popleft()
+            self.sum_abs_error -= old_abs_error
+            self.sum_PV2 -= old_PV * old_PV
+            delta = old_PV - self.mean_PV
+            self.mean_PV -= delta / len(self.samples)
+            self.M2_PV = max(self.M2_PV - delta * (old_PV - self.mean_PV), 0.0)
+
+        self._updates += 1
+        if self._updates >= self.window:
+            self._resync()
+        return self.status()
+
+    def _resync(self):
+        self._updates = 0
+        self.sum_abs_error = math.fsum(e for _, e in self.samples)
+        self.mean_PV = math.fsum(pv for pv, _ in self.samples) / len(self.samples)
+        self.M2_PV = math.fsum((pv - self.mean_PV) ** 2 for pv, _ in self.samples)
+        self.sum_PV2 = math.fsum(pv * pv for pv, _ in self.samples)
+
+    def status(self):
+        n = len(self.samples)
+        # El máximo de la autocovarianza (np.correlate / N) está en el desfase 0: sum(PV²) / N
+        acf_max = self.sum_PV2 / n
+        return WindowStatus(
+            n_samples=n,
+            IAE=self.sum_abs_error,
+            mean_PV=self.mean_PV,
+            std_PV=math.sqrt(self.M2_PV / n),
+            acf_max=acf_max,
+            oscillating_IAE=self.sum_abs_error > self.IAElim,
+            perturbations_ACF=acf_max > self.umbral_acf,
+        )
+
+
+def tail_lines(file_name, from_start=False, poll_interval=0.5):
+    """Líneas nuevas de un archivo que sigue creciendo (como `tail -f`). La primera es la cabecera."""
+    with open(file_name, encoding='utf-8', errors='ignore') as f:
+        yield f.readline()
+        if not from_start:
+            f.seek(0, 2)
+        pending = ''
+        while True:
+            line = f.readline()
+            if not line:
+                time.sleep(poll_interval)
+                continue
+            pending += line
+            # Una línea sin salto final todavía se está escribiendo
+            if pending.endswith('\n'):
+                yield pending
+                pending = ''
+
+
+def socket_lines(address):
+    host, port = address.rsplit(':', 1)
+    with socket.create_connection((host, int(port))) as conn:
+        with conn.makefile(encoding='utf-8', errors='ignore') as f:
+            yield from f
+
+
+def read_samples(lines, sep=None):
+    """Convierte líneas CSV (con cabecera) en pares (PV, SP); ignora las líneas mal formadas."""
+    lines = iter(lines)
+    header = next(lines).strip()
+    if sep is None:
+        sep = ';' if header.count(';') > header.count(',') else ','
+    columns = header.split(sep)
+    i_PV, i_SP = columns.index('PV'), columns.index('SP')
+    for line in lines:
+        fields = line.strip().split(sep)
+        try:
+            yield float(fields[i_PV]), float(fields[i_SP])
+        except (IndexError, ValueError):
+            continue
+
+
+def format_status(status):
+    iae = "❎ oscilación (IAE)" if status.oscillating_IAE else "✅ IAE"
+    acf = "❎ perturbaciones (ACF)" if status.perturbations_ACF else "✅ ACF"
+    return (f"n={status.n_samples} IAE={status.IAE:.4g} std PV={status.std_PV:.4g} "
+            f"ACF máx={status.acf_max:.4g} | {iae} | {acf}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitoreo en línea de un lazo con ventana deslizante.")
+    parser.add_argument('source', help="CSV que sigue creciendo, '-' para la entrada estándar o tcp://host:puerto")
+    parser.add_argument('--window', type=int, default=600, help="Muestras en la ventana deslizante")
+    parser.add_argument('--every', type=int, default=0,
+                        help="Imprimir el estado cada N muestras (por defecto, solo cuando cambia una alarma)")
+    parser.add_argument('--sep', default=None, help="Separador del CSV (por defecto se detecta)")
+    parser.add_argument('--iae-lim', type=float, default=IAElim, help="Límite de IAE en la ventana")
+    parser.add_argument('--umbral-acf', type=float, default=umbral_acf, help="Umbral de la ACF")
+    parser.add_argument('--from-start', action='store_true', help="Procesar también las filas ya escritas")
+    args = parser.parse_args(argv)
+    if args.window < 1:
+        parser.error("--window debe ser al menos 1")
+
+    if args.source == '-':
+        lines = sys.stdin
+    elif args.source.startswith('tcp://'):
+        lines = socket_lines(args.source[len('tcp://'):])
+    else:
+        lines = tail_lines(args.source, from_start=args.from_start)
+
+    monitor = SlidingWindowMonitor(args.window, IAElim=args.iae_lim, umbral_acf=args.umbral_acf)
+    alarms = None
+    try:
+        for i, (PV, SP) in enumerate(read_samples(lines, sep=args.sep), 1):
+            status = monitor.update(PV, SP)
+            current = (status.oscillating_IAE, status.perturbations_ACF)
+            if current != alarms or (args.every and i % args.every == 0):
+                print(format_status(status), flush=True)
+                alarms = current
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
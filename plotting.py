@@ -0,0 +1,150 @@
+from io import BytesIO
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.collections import LineCollection
+from PIL import Image
+
+# Puntos por píxel de ancho de los ejes: con min/max por columna de píxeles no se pierde ningún extremo
+POINTS_PER_PIXEL = 2
+
+
+def minmax_decimate(x, y, n_buckets):
+    """Reduce (x, y) a como máximo 2 * n_buckets puntos conservando el mínimo y el máximo de cada tramo."""
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    N = len(y)
+    if n_buckets <= 0 or N <= 2 * n_buckets:
+        return x, y
+    size = N // n_buckets
+    n_full = size * n_buckets
+    buckets = y[:n_full].reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    i_min = offsets + np.argmin(buckets, axis=1)
+    i_max = offsets + np.argmax(buckets, axis=1)
+    # Orden temporal dentro de cada tramo, más las muestras que sobran al final
+    idx = np.sort(np.stack((i_min, i_max), axis=1), axis=1).ravel()
+    idx = np.concatenate((idx, np.arange(n_full, N)))
+    return x[idx], y[idx]
+
+
+def _pixel_budget(ax):
+    return max(int(ax.get_window_extent().width), 100)
+
+
+class DecimatedLine:
+    """Línea que dibuja solo lo que cabe en los píxeles del eje y recalcula el detalle al hacer zoom.
+
+    `x` debe estar ordenado de forma creciente.
+    """
+
+    def __init__(self, ax, x, y, marker=None, **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.marker = marker
+        self.line, = ax.plot([], [], **kwargs)
+        self.update()
+        ax.relim()
+        ax.autoscale_view()
+        self._callback = ax.callbacks.connect('xlim_changed', lambda ax: self.update(ax.get_xlim()))
+
+    def set_data(self, x, y):
+        """Reemplaza los datos sin crear otra línea (p. ej. al cargar otro archivo)."""
+        self.x = np.asarray(x)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.update()
+
+    def remove(self):
+        """Quita la línea del eje y deja de seguir su zoom."""
+        self.ax.callbacks.disconnect(self._callback)
+        self.line.remove()
+
+    def update(self, xlim=None):
+        start, stop = 0, len(self.x)
+        if xlim is not None:
+            if np.issubdtype(self.x.dtype, np.datetime64):
+                # Con fechas, los límites del eje vienen en días de matplotlib
+                xlim = [np.datetime64(mdates.num2date(v).replace(tzinfo=None)) for v in xlim]
+            # Un punto extra a cada lado para que la línea llegue hasta el borde del eje
+            start = max(np.searchsorted(self.x, xlim[0]) - 1, 0)
+            stop = min(np.searchsorted(self.x, xlim[1], side='right') + 1, len(self.x))
+        budget = _pixel_budget(self.ax)
+        x, y = minmax_decimate(self.x[start:stop], self.y[start:stop], budget)
+        self.line.set_data(x, y)
+        # Los marcadores solo se dibujan cuando se muestran todas las muestras del tramo
+        decimated = len(x) < stop - start
+        self.line.set_marker('None' if decimated or self.marker is None else self.marker)
+
+
+def figure_to_png(fig):
+    """PNG en memoria de la figura, sin canal alfa.
+
+    PyFPDF separa el canal alfa de un PNG RGBA píxel a píxel en Python (~0.5 s por figura);
+    un PNG RGB se incrusta sin decodificar.
+    """
+    fig.canvas.draw()
+    rgb = np.asarray(fig.canvas.buffer_rgba())[..., :3]
+    output = BytesIO()
+    # Compresión rápida: el tamaño casi no cambia en gráficos de líneas y se codifica varias veces más rápido
+    Image.fromarray(rgb).save(output, format='png', compress_level=1)
+    return output.getvalue()
+
+
+def plot_decimated(ax, x, y, **kwargs):
+    return DecimatedLine(ax, x, y, **kwargs)
+
+
+def _acf_bars(ax, time_lags, acf, max_lag=None):
+    # Segmentos de las barras de la ACF y límites de los ejes que las contienen
+    time_lags = np.asarray(time_lags)
+    acf = np.asarray(acf, dtype=np.float64)
+    if max_lag is not None:
+        keep = np.abs(time_lags) <= max_lag
+        time_lags, acf = time_lags[keep], acf[keep]
+
+    n_buckets = _pixel_budget(ax)
+    if len(acf) > n_buckets:
+        size = len(acf) // n_buckets
+        n_full = size * n_buckets
+        buckets = acf[:n_full].reshape(n_buckets, size)
+        lags = time_lags[:n_full].reshape(n_buckets, size)[:, size // 2]
+        low = np.minimum(buckets.min(axis=1), 0)
+        high = np.maximum(buckets.max(axis=1), 0)
+        lags = np.concatenate((lags, time_lags[n_full:]))
+        low = np.concatenate((low, np.minimum(acf[n_full:], 0)))
+        high = np.concatenate((high, np.maximum(acf[n_full:], 0)))
+    else:
+        lags, low, high = time_lags, np.minimum(acf, 0), np.maximum(acf, 0)
+
+    segments = np.stack((np.column_stack((lags, low)), np.column_stack((lags, high))), axis=1)
+    limits = None
+    if len(lags):
+        limits = ((lags[0] - 1, lags[-1] + 1), (min(low.min(), 0) * 1.05, max(high.max(), 0) * 1.05 or 1))
+    return segments, limits
+
+
+def plot_acf(ax, time_lags, acf, max_lag=None, **kwargs):
+    """Autocovarianza como LineCollection de barras verticales (más rápido que plt.stem).
+
+    Solo se muestran los desfases |k| <= max_lag; si hay más desfases que píxeles se dibuja
+    una barra por columna de píxeles, del mínimo al máximo del tramo.
+    """
+    segments, limits = _acf_bars(ax, time_lags, acf, max_lag)
+    collection = LineCollection(segments, **kwargs)
+    ax.add_collection(collection)
+    ax.axhline(0, color='black', linewidth=0.8)
+    if limits:
+        ax.set_xlim(*limits[0])
+        ax.set_ylim(*limits[1])
+    return collection
+
+
+def update_acf(collection, time_lags, acf, max_lag=None):
+    """Reemplaza las barras de una autocovarianza dibujada con plot_acf, sin volver a crear la colección."""
+    ax = collection.axes
+    segments, limits = _acf_bars(ax, time_lags, acf, max_lag)
+    collection.set_segments(segments)
+    if limits:
+        ax.set_xlim(*limits[0])
+        ax.set_ylim(*limits[1])
@@ -0,0 +1,261 @@
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from fpdf import FPDF
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from acf import ACF_MAX_LAG
+from batch import find_loop_files, write_summary
+from loader import load_loop_file
+from loop_analyzer import LoopAnalyzer
+from multiloop import VARIABLES, analyze_loops, discover_loops
+from plotting import figure_to_png, plot_acf, plot_decimated
+from metrics import format_metrics
+from spectral import format_oscillations
+from stiction import format_stiction
+
+# Figuras de cada lazo, en el orden en que aparecen en el informe
+FIGURES = (
+    ('variables_vs_tiempo', "Variables del Proceso vs Tiempo"),
+    ('error_absoluto', "Error Absoluto a lo Largo del Tiempo"),
+    ('espectro_potencia', "Densidad Espectral de Potencia (Welch)"),
+    ('autocovarianza', "Autocovarianza en el Dominio del Tiempo"),
+)
+FIGURE_SIZE = (10, 5)
+COLORS = {'PV': 'blue', 'SP': 'red', 'OP': 'green', 'Error': 'orange'}
+# Columnas de la tabla resumen: (encabezado, ancho en mm)
+SUMMARY_COLUMNS = (('#', 10), ('Archivo', 52), ('Lazo', 28), ('IAE', 28), ('Osc. IAE', 18),
+                   ('Pert. ACF', 18), ('Período dom.', 22), ('Agarre', 14))
+
+
+def _figure():
+    # API orientada a objetos de Agg: cada figura es independiente y no pasa por el estado global de pyplot
+    fig = Figure(figsize=FIGURE_SIZE)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+def render_loop_figures(time_axis, columns, result, max_lag=None):
+    """Las figuras de un lazo renderizadas a PNG en memoria: {nombre: bytes}.
+
+    `columns` es {'PV': arreglo, 'SP': ..., 'OP': ..., 'Error': ...} (Error es opcional).
+    """
+    titles = dict(FIGURES)
+    figures = {}
+
+    fig, ax = _figure()
+    for variable, values in columns.items():
+        plot_decimated(ax, time_axis, values, label=variable, color=COLORS[variable])
+    ax.set(title=titles['variables_vs_tiempo'], xlabel='Tiempo', ylabel='Valor')
+    ax.grid(True)
+    ax.legend()
+    figures['variables_vs_tiempo'] = figure_to_png(fig)
+
+    fig, ax = _figure()
+    plot_decimated(ax, time_axis, result.absolute_error, linestyle='-')
+    ax.set(title=titles['error_absoluto'], xlabel='Tiempo', ylabel='Error Absoluto')
+    ax.grid(True)
+    figures['error_absoluto'] = figure_to_png(fig)
+
+    fig, ax = _figure()
+    plot_decimated(ax, result.psd_frequencies, result.psd, label='PSD de PV')
+    if result.oscillations:
+        ax.plot([o.frequency for o in result.oscillations], [o.power for o in result.oscillations],
+                'ro', label='Oscilaciones dominantes')
+    ax.set(title=titles['espectro_potencia'], xlabel='Frecuencia (Hz)', ylabel='Potencia')
+    ax.grid(True)
+    ax.legend()
+    figures['espectro_potencia'] = figure_to_png(fig)
+
+    fig, ax = _figure()
+    plot_acf(ax, result.time_lags, result.acf, max_lag=max_lag)
+    if result.perturbations_ACF:
+        ax.axhline(y=result.umbral_acf, color='r', linestyle='--', label=f'Umbral ACF ({result.umbral_acf})')
+        ax.legend()
+    ax.set(title=titles['autocovarianza'], xlabel='Desfase', ylabel='Autocovarianza')
+    ax.grid(True)
+    figures['autocovarianza'] = figure_to_png(fig)
+    return figures
+
+
+def loop_entry(file_name, tag, result, images=None):
+    """Entrada del informe de un lazo analizado: fila de resumen, textos y rutas de las figuras."""
+    return {'file': file_name, 'loop': tag, 'error': '', 'summary': result.summary(),
+            'oscillations': format_oscillations(result.oscillations),
+            'metrics': format_metrics(result) + format_stiction(result), 'images': images or {}}
+
+
+def analyze_file(file_name, image_dir, sep=None, max_lag=ACF_MAX_LAG, cache_dir=None):
+    """Analiza un archivo una sola vez (se ejecuta en un proceso aparte).
+
+    Devuelve una entrada por lazo con la fila de resumen y los textos; en 'pending' va la ruta del
+    archivo de image_dir con los datos de sus figuras, que render_loop dibuja como otra tarea. Así
+    un archivo con cientos de lazos reparte el dibujo entre todos los procesos.
+    """
+    try:
+        data = load_loop_file(file_name, sep=sep, cache_dir=cache_dir)
+        mapping = discover_loops(data.columns)
+        results = analyze_loops(data, mapping, analyzer=LoopAnalyzer(max_lag=max_lag))
+        time_axis = data['Time'].to_numpy() if 'Time' in data else np.arange(len(data))
+        entries = []
+        for tag, result in results.items():
+            columns = {v: data[mapping[tag][v]].to_numpy(dtype=np.float64)
+                       for v in VARIABLES if v in mapping[tag]}
+            fd, path = tempfile.mkstemp(suffix='.pickle', dir=image_dir)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((time_axis, columns, result), f, protocol=pickle.HIGHEST_PROTOCOL)
+            entries.append(dict(loop_entry(file_name, tag, result), pending=path))
+    except Exception as e:
+        entries = [{'file': file_name, 'loop': '', 'error': str(e), 'summary': {}, 'oscillations': [],
+                    'metrics': [], 'images': {}}]
+    return entries
+
+
+def render_loop(path, max_lag=ACF_MAX_LAG):
+    """Dibuja las figuras de un lazo guardado por analyze_file y devuelve {nombre: ruta del PNG}.
+
+    Las imágenes viajan como archivos para no copiar los PNG entre procesos.
+    """
+    with open(path, 'rb') as f:
+        time_axis, columns, result = pickle.load(f)
+    os.remove(path)
+    images = {}
+    for name, png in render_loop_figures(time_axis, columns, result, max_lag=max_lag).items():
+        fd, image_path = tempfile.mkstemp(suffix='.png', dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(png)
+        images[name] = image_path
+    return images
+
+
+def _latin1(text):
+    # Las fuentes estándar de FPDF solo cubren Latin-1
+    return str(text).encode('latin-1', 'replace').decode('latin-1')
+
+
+def _yes_no(value):
+    return 'Sí' if value else 'No'
+
+
+def _summary_table(pdf, entries):
+    pdf.set_font("Arial", 'B', size=9)
+    for header, width in SUMMARY_COLUMNS:
+        pdf.cell(width, 7, _latin1(header), border=1, align='C')
+    pdf.ln()
+    pdf.set_font("Arial", size=8)
+    for number, entry in enumerate(entries, start=1):
+        summary = entry['summary']
+        if entry['error']:
+            cells = (number, os.path.basename(entry['file']), '', 'Error: ' + entry['error'], '', '', '', '')
+        else:
+            period = summary['dominant_period']
+            cells = (number, os.path.basename(entry['file']), entry['loop'], f"{summary['IAE']:.6g}",
+                     _yes_no(summary['oscillating_IAE']), _yes_no(summary['perturbations_ACF']),
+                     f"{period:.6g}" if np.isfinite(period) else '-', _yes_no(summary['stiction_likely']))
+        for (_, width), value in zip(SUMMARY_COLUMNS, cells):
+            # Los textos largos se recortan para que la fila ocupe una sola línea
+            text = _latin1(value)
+            while text and pdf.get_string_width(text) > width - 2:
+                text = text[:-1]
+            pdf.cell(width, 6, text, border=1)
+        pdf.ln()
+
+
+def _loop_section(pdf, number, entry):
+    summary = entry['summary']
+    pdf.add_page()
+    title = os.path.basename(entry['file']) + (f" - lazo {entry['loop']}" if entry['loop'] else '')
+    pdf.set_font("Arial", 'B', size=14)
+    pdf.cell(0, 10, _latin1(f"{number}. {title}"), ln=True)
+    pdf.set_font("Arial", size=10)
+    lines = [
+        f"Muestras: {summary['n_samples']}",
+        f"Valor de IAE: {summary['IAE']}  (IAElim: {summary['IAElim']})",
+        f"Oscilaciones significativas (IAE): {_yes_no(summary['oscillating_IAE'])}",
+        f"Perturbaciones (ACF): {_yes_no(summary['perturbations_ACF'])}",
+        f"Media de PV: {summary['mean_PV']}   Media de OP: {summary['mean_OP']}",
+        f"Desviación estándar de PV: {summary['std_PV']}   de OP: {summary['std_OP']}",
+        f"Covarianza de PV: {summary['covariance_PV']}   de OP: {summary['covariance_OP']}",
+    ] + entry['metrics'] + entry['oscillations']
+    for line in lines:
+        pdf.multi_cell(0, 6, _latin1(line))
+    for name, _ in FIGURES:
+        # Sin coordenada y, FPDF ubica la imagen a continuación y agrega una página si no cabe
+        pdf.image(entry['images'][name], x=10, w=180)
+
+
+def build_report(entries, output, title="Informe de Lazos de Control"):
+    """Arma un único PDF con la tabla resumen y una sección por lazo."""
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', size=16)
+    pdf.cell(0, 12, _latin1(title), ln=True, align='C')
+    pdf.set_font("Arial", size=10)
+    analyzed = [entry for entry in entries if not entry['error']]
+    pdf.cell(0, 8, _latin1(f"{len(analyzed)} lazos analizados, {len(entries) - len(analyzed)} archivos con errores."),
+             ln=True)
+    _summary_table(pdf, entries)
+    for number, entry in enumerate(entries, start=1):
+        if not entry['error']:
+            _loop_section(pdf, number, entry)
+    pdf.output(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Informe PDF de varios archivos de lazos de control.")
+    parser.add_argument('paths', nargs='+', help="Directorios o patrones glob con archivos de lazos")
+    parser.add_argument('-o', '--output', default='informe.pdf', help="Archivo PDF de salida")
+    parser.add_argument('--title', default="Informe de Lazos de Control", help="Título del informe")
+    parser.add_argument('--summary', default=None, help="Guardar también la tabla resumen (.csv o .parquet)")
+    parser.add_argument('--sep', default=None, help="Separador de los archivos CSV (por defecto se detecta)")
+    parser.add_argument('--workers', type=int, default=None, help="Número de procesos (por defecto, todos los núcleos)")
+    parser.add_argument('--max-lag', type=int, default=ACF_MAX_LAG, help="Desfase máximo de la ACF")
+    parser.add_argument('--cache-dir', default=None, help="Directorio de caché en disco de los archivos leídos")
+    args = parser.parse_args(argv)
+
+    files = find_loop_files(args.paths)
+    if not files:
+        print("No se encontraron archivos de lazos.", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    entries = []
+    with tempfile.TemporaryDirectory() as image_dir:
+        analyze = partial(analyze_file, image_dir=image_dir, sep=args.sep, max_lag=args.max_lag,
+                          cache_dir=args.cache_dir)
+        renders = []
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            # Cada archivo se analiza una vez; las figuras de sus lazos se dibujan como tareas separadas
+            for i, file_entries in enumerate(executor.map(analyze, files), start=1):
+                for entry in file_entries:
+                    if 'pending' in entry:
+                        renders.append((entry, executor.submit(render_loop, entry.pop('pending'), max_lag=args.max_lag)))
+                entries.extend(file_entries)
+                print(f"[{i}/{len(files)}] {file_entries[0]['file']} ({len(file_entries)} lazos)", flush=True)
+            for entry, future in renders:
+                try:
+                    entry['images'] = future.result()
+                except Exception as e:
+                    entry['error'] = str(e)
+        build_report(entries, args.output, title=args.title)
+
+    if args.summary:
+        write_summary([dict(entry['summary'], file=entry['file'], loop=entry['loop'], error=entry['error'])
+                       for entry in entries], args.summary)
+    failed = sum(1 for entry in entries if entry['error'])
+    print(f"{len(entries) - failed} lazos en {args.output} ({failed} archivos con errores), "
+          f"{time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
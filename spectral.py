@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.signal import find_peaks, welch
+
+# Largo de los segmentos de Welch: el costo crece como N log(nperseg) y la resolución es fs / nperseg
+WELCH_NPERSEG = 4096
+# Oscilaciones que se informan; un pico cuenta si su prominencia supera una fracción del pico más
+# alto del espectro y también varias veces el piso de ruido (la mediana de la PSD)
+MAX_OSCILLATIONS = 5
+MIN_RELATIVE_PROMINENCE = 0.05
+MIN_PROMINENCE_OVER_FLOOR = 4
+
+
+@dataclass
+class Oscillation:
+    """Oscilación dominante del espectro de un lazo."""
+    frequency: float
+    period: float
+    power: float
+    prominence: float
+
+
+def sampling_frequency(time, default=1.0):
+    """Frecuencia de muestreo (muestras por unidad de tiempo) a partir de la columna Time.
+
+    Se usa la mediana de los intervalos, así que algunas muestras faltantes no la alteran.
+    Si Time no existe o no es creciente se devuelve `default`.
+    """
+    if time is None or len(time) < 2:
+        return default
+    time = np.asarray(time)
+    if np.issubdtype(time.dtype, np.datetime64):
+        steps = np.diff(time) / np.timedelta64(1, 's')
+    else:
+        try:
+            steps = np.diff(time.astype(np.float64))
+        except (TypeError, ValueError):
+            return default
+    step = np.median(steps[np.isfinite(steps)]) if np.isfinite(steps).any() else np.nan
+    return float(1 / step) if step > 0 else default
+
+
+def welch_psd(values, fs=1.0, nperseg=WELCH_NPERSEG):
+    """PSD de Welch de un arreglo (N,) o (N, lazos) por columnas: (frecuencias, psd).
+
+    Se promedian segmentos de nperseg muestras con ventana de Hann y 50 % de solapamiento, sin
+    el valor medio de cada segmento; para registros cortos hay un único segmento de todo el largo.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return welch(values, fs=fs, nperseg=min(nperseg, len(values)), detrend='constant', axis=0)
+
+
+def _refine_frequency(frequencies, psd, i):
+    # Parábola por el logaritmo de los tres puntos del pico: afina la frecuencia por debajo de fs / nperseg
+    if i + 1 >= len(psd) or np.any(psd[i - 1:i + 2] <= 0):
+        return frequencies[i]
+    a, b, c = np.log(psd[i - 1:i + 2])
+    denominator = a - 2 * b + c
+    offset = 0.5 * (a - c) / denominator if denominator < 0 else 0.0
+    return frequencies[i] + offset * (frequencies[1] - frequencies[0])
+
+
+def rank_oscillations(frequencies, psd, max_oscillations=MAX_OSCILLATIONS,
+                      min_relative_prominence=MIN_RELATIVE_PROMINENCE,
+                      min_prominence_over_floor=MIN_PROMINENCE_OVER_FLOOR):
+    """Picos del espectro de un lado ordenados por prominencia, sin la componente continua."""
+    frequencies = np.asarray(frequencies)
+    psd = np.asarray(psd, dtype=np.float64)
+    if len(psd) < 3 or not np.any(psd[1:] > 0):
+        return []
+    threshold = max(min_relative_prominence * np.max(psd[1:]), min_prominence_over_floor * np.median(psd[1:]))
+    # find_peaks nunca marca el primer punto, así que la componente continua queda afuera
+    peaks, properties = find_peaks(psd, prominence=threshold)
+    prominences = properties['prominences']
+    oscillations = []
+    for i in np.argsort(prominences)[::-1][:max_oscillations]:
+        frequency = float(_refine_frequency(frequencies, psd, peaks[i]))
+        oscillations.append(Oscillation(frequency=frequency, period=1 / frequency,
+                                        power=float(psd[peaks[i]]), prominence=float(prominences[i])))
+    return oscillations
+
+
+def format_oscillations(oscillations):
+    """Líneas de texto con las oscilaciones dominantes, para las interfaces y los informes."""
+    if not oscillations:
+        return ["No se detectaron oscilaciones dominantes en el espectro."]
+    lines = ["Oscilaciones dominantes (ordenadas por prominencia):"]
+    for rank, o in enumerate(oscillations, start=1):
+        lines.append(f"{rank}. frecuencia {o.frequency:.6g} Hz, período {o.period:.6g}, "
+                     f"potencia {o.power:.4g}, prominencia {o.prominence:.4g}")
+    return lines
@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# Filas por bloque: PV, OP y el error de un bloque quedan en caché mientras se recorren, así que
+# cada arreglo se lee una sola vez desde memoria
+KERNEL_BLOCK = 16384
+
+
+@dataclass
+class LoopMoments:
+    """Medias, sumas de cuadrados centradas e IAE por columna, con el error ya calculado."""
+    n: int
+    mean_PV: np.ndarray
+    mean_OP: np.ndarray
+    M2_PV: np.ndarray
+    M2_OP: np.ndarray
+    IAE: np.ndarray
+    error: np.ndarray
+    absolute_error: np.ndarray
+
+    def variance(self, variable, ddof=0):
+        M2 = self.M2_PV if variable == 'PV' else self.M2_OP
+        if self.n <= ddof:
+            return np.full(M2.shape, np.nan)
+        return M2 / (self.n - ddof)
+
+
+def as_float64(values):
+    """Arreglo (N, lazos) float64 contiguo por filas; no copia si ya lo es (Series, listas o arreglos)."""
+    values = np.asarray(values, dtype=np.float64)
+    return np.ascontiguousarray(values.reshape(len(values), -1))
+
+
+def loop_moments(PV, SP, OP, block=KERNEL_BLOCK):
+    """Una pasada por bloques sobre PV, SP y OP (N, lazos) float64 contiguos.
+
+    El error SP - PV y su valor absoluto se escriben una sola vez en los arreglos de salida; las
+    medias y sumas de cuadrados de cada bloque se combinan con la fórmula de Chan, que no pierde
+    precisión como la suma de cuadrados sin centrar. El único temporal es un búfer de un bloque
+    que se reutiliza.
+    """
+    N, n_loops = PV.shape
+    error = np.empty_like(PV)
+    absolute_error = np.empty_like(PV)
+    IAE = np.zeros(n_loops)
+    means = np.zeros((2, n_loops))
+    M2 = np.zeros((2, n_loops))
+    block_mean = np.empty(n_loops)
+    deviation = np.empty((min(block, N), n_loops))
+    count = 0
+    for start in range(0, N, block):
+        stop = min(start + block, N)
+        m = stop - start
+        e, a = error[start:stop], absolute_error[start:stop]
+        np.subtract(SP[start:stop], PV[start:stop], out=e)
+        np.abs(e, out=a)
+        IAE += a.sum(axis=0)
+        for k, values in enumerate((PV, OP)):
+            x = values[start:stop]
+            np.divide(x.sum(axis=0), m, out=block_mean)
+            d = np.subtract(x, block_mean, out=deviation[:m])
+            delta = block_mean - means[k]
+            means[k] += delta * (m / (count + m))
+            M2[k] += np.einsum('ij,ij->j', d, d) + delta * delta * (count * m / (count + m))
+        count += m
+    if N == 0:
+        means[:] = np.nan
+    return LoopMoments(n=N, mean_PV=means[0], mean_OP=means[1], M2_PV=M2[0], M2_OP=M2[1], IAE=IAE,
+                       error=error, absolute_error=absolute_error)
@@ -0,0 +1,242 @@
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import correlate, resample_poly
+
+# Los registros más largos se diezman antes del diagnóstico: el costo por lazo queda acotado
+STICTION_MAX_SAMPLES = 20_000
+# Al diezmar se conservan al menos estas muestras por período de la oscilación dominante
+SAMPLES_PER_PERIOD = 16
+# Segmentos de la bicoherencia (Hann, 50 % de solapamiento) y nivel de significancia
+BICOHERENCE_NFFT = 128
+BICOHERENCE_ALPHA = 0.05
+# Umbrales de no gaussianidad y no linealidad (Choudhury, Shah y Thornhill, 2004)
+NGI_THRESHOLD = 0.001
+NLI_THRESHOLD = 0.01
+# Potencia de los armónicos 2 a 5 relativa a la fundamental a partir de la cual la oscilación no es
+# senoidal; cubre los ciclos límite simétricos (onda cuadrada), cuya bicoherencia es nula
+HARMONIC_THRESHOLD = 0.05
+HARMONICS = 5
+# Asimetría de la correlación cruzada OP-error a partir de la cual se la considera impar (Horch, 1999)
+XCORR_ODD_THRESHOLD = 0.5
+# Los métodos suponen operación regulatoria: con cambios de SP mayores que esta fracción del
+# rango de PV no se emite veredicto
+SETPOINT_TOLERANCE = 0.05
+
+
+def decimation_factor(N, period=None, max_samples=STICTION_MAX_SAMPLES, nfft=BICOHERENCE_NFFT):
+    """Factor de diezmado para un registro de N muestras con una oscilación de `period` muestras.
+
+    Se diezma hasta max_samples y, si hay oscilación, hasta unas SAMPLES_PER_PERIOD muestras por
+    período (así un segmento de la bicoherencia abarca varios ciclos), dejando al menos 8 segmentos.
+    """
+    factor = math.ceil(N / max_samples)
+    if period is not None and np.isfinite(period):
+        factor = max(factor, int(period // SAMPLES_PER_PERIOD))
+    return max(1, min(factor, N // (8 * nfft)))
+
+
+def decimate(values, factor):
+    """Diezmado por columnas con filtro antialias FIR (resample_poly)."""
+    values = np.asarray(values, dtype=np.float64)
+    # padtype='line' extiende la señal en los bordes en lugar de rellenar con ceros
+    return values if factor <= 1 else resample_poly(values, 1, factor, axis=0, padtype='line')
+
+
+def bicoherence(x, nfft=BICOHERENCE_NFFT):
+    """Bicoherencia al cuadrado en el dominio principal (0 < f2 <= f1, f1 + f2 <= fs/2).
+
+    Devuelve (bic², número de segmentos); todos los segmentos y pares de frecuencias se calculan juntos.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) < nfft:
+        return np.zeros(0), 0
+    segments = sliding_window_view(x, nfft)[::nfft // 2]
+    segments = (segments - segments.mean(axis=1, keepdims=True)) * np.hanning(nfft)
+    X = np.fft.rfft(segments, axis=1)
+    k = np.arange(1, nfft // 2 + 1)
+    f1, f2 = np.meshgrid(k, k, indexing='ij')
+    domain = (f2 <= f1) & (f1 + f2 <= nfft // 2)
+    X1, X2, X3 = X[:, f1[domain]], X[:, f2[domain]], X[:, f1[domain] + f2[domain]]
+    product = X1 * X2
+    B = np.mean(product * np.conj(X3), axis=0)
+    denominator = np.mean(np.abs(product) ** 2, axis=0) * np.mean(np.abs(X3) ** 2, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bic2 = np.where(denominator > 0, np.abs(B) ** 2 / denominator, 0.0)
+    return bic2, len(segments)
+
+
+def nonlinearity_indices(x, nfft=BICOHERENCE_NFFT, alpha=BICOHERENCE_ALPHA):
+    """Índices de no gaussianidad (NGI) y no linealidad (NLI) a partir de la bicoherencia.
+
+    NGI es la bicoherencia media menos su valor crítico para una señal gaussiana (chi² con 2
+    grados de libertad); NLI = |máx(bic²) - (media(bic²) + 2 desvío(bic²))|.
+    """
+    bic2, K = bicoherence(x, nfft)
+    if K == 0 or not len(bic2):
+        return float('nan'), float('nan')
+    critical = -2 * math.log(alpha) / (2 * K)
+    NGI = float(np.mean(bic2) - critical)
+    NLI = float(abs(np.max(bic2) - (np.mean(bic2) + 2 * np.std(bic2))))
+    return NGI, NLI
+
+
+def harmonic_distortion(x, period, harmonics=HARMONICS):
+    """Potencia de los armónicos 2..harmonics relativa a la fundamental de período `period` (en muestras).
+
+    Se usa un periodograma con ventana de Hann y se suma la potencia de unos pocos bins alrededor
+    de cada armónico; NaN si no hay período o el registro no abarca varios ciclos.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if period is None or not np.isfinite(period) or period <= 0 or n < 4 * period:
+        return float('nan')
+    power = np.abs(np.fft.rfft((x - x.mean()) * np.hanning(n))) ** 2
+    fundamental = n / period
+
+    def band(h):
+        center = int(round(h * fundamental))
+        return float(np.sum(power[max(center - 3, 1):center + 4]))
+
+    top = min(harmonics, int((len(power) - 4) // fundamental))
+    first = band(1)
+    if top < 2 or first <= 0:
+        return float('nan')
+    return sum(band(h) for h in range(2, top + 1)) / first
+
+
+def xcorr_asymmetry(OP, error):
+    """Asimetría de la correlación cruzada entre OP y el error, en [0, 1] (Horch, 1999).
+
+    Compara los primeros cruces por cero a cada lado del desfase 0: 0 es una función par (lazo
+    agresivo o perturbación externa) y 1 una función impar, típica del agarre de la válvula.
+    """
+    u = np.asarray(OP, dtype=np.float64)
+    e = np.asarray(error, dtype=np.float64)
+    u, e = u - u.mean(), e - e.mean()
+    if len(u) < 3 or not np.any(u) or not np.any(e):
+        return float('nan')
+    c = correlate(e, u, mode='full', method='fft')
+    zero = len(u) - 1
+
+    def first_crossing(side):
+        negative = np.signbit(side)
+        k = np.flatnonzero(negative[1:] != negative[:-1])
+        if not len(k):
+            return None
+        k = k[0]
+        return k + side[k] / (side[k] - side[k + 1])
+
+    right, left = first_crossing(c[zero:]), first_crossing(c[zero::-1])
+    if right is None or left is None or right + left <= 0:
+        return float('nan')
+    return float(abs(right - left) / (right + left))
+
+
+def fit_ellipse(x, y):
+    """Ajuste directo por mínimos cuadrados de una elipse (Fitzgibbon; forma estable de Halír y Flusser).
+
+    Devuelve los coeficientes (a, b, c, d, e, f) de a x² + b xy + c y² + d x + e y + f = 0, o None.
+    """
+    D1 = np.column_stack((x * x, x * y, y * y))
+    D2 = np.column_stack((x, y, np.ones_like(x)))
+    S1, S2, S3 = D1.T @ D1, D1.T @ D2, D2.T @ D2
+    try:
+        T = -np.linalg.solve(S3, S2.T)
+        M = S1 + S2 @ T
+        M = np.array([M[2] / 2, -M[1], M[0] / 2])
+        _, vectors = np.linalg.eig(M)
+    except np.linalg.LinAlgError:
+        return None
+    vectors = np.real(vectors)
+    condition = 4 * vectors[0] * vectors[2] - vectors[1] ** 2
+    if not np.any(condition > 0):
+        return None
+    a1 = vectors[:, np.argmax(condition)]
+    return np.concatenate((a1, T @ a1))
+
+
+def apparent_stiction(PV, OP):
+    """Agarre aparente en unidades de OP: ancho de la elipse ajustada al gráfico PV-OP a la altura de su centro.
+
+    Sin histéresis la elipse se aplana y el ancho tiende a 0; NaN si los puntos no forman una elipse.
+    """
+    x = np.asarray(OP, dtype=np.float64)
+    y = np.asarray(PV, dtype=np.float64)
+    x_scale, y_scale = np.std(x), np.std(y)
+    if len(x) < 6 or x_scale == 0 or y_scale == 0:
+        return float('nan')
+    # Las variables se normalizan para que el sistema quede bien condicionado
+    coefficients = fit_ellipse((x - x.mean()) / x_scale, (y - y.mean()) / y_scale)
+    if coefficients is None:
+        return float('nan')
+    a, b, c, d, e, f = coefficients
+    discriminant = b * b - 4 * a * c
+    if discriminant >= 0:
+        return float('nan')
+    y0 = (2 * a * e - b * d) / discriminant
+    # Cuerda horizontal por el centro: a x² + (b y0 + d) x + (c y0² + e y0 + f) = 0
+    p, q = b * y0 + d, c * y0 * y0 + e * y0 + f
+    width = p * p - 4 * a * q
+    return float(np.sqrt(width) / abs(a) * x_scale) if width > 0 else float('nan')
+
+
+def no_diagnosis():
+    """Resultado sin diagnóstico de agarre: índices en NaN y ningún veredicto."""
+    return {
+        'NGI': float('nan'),
+        'NLI': float('nan'),
+        'harmonic_distortion': float('nan'),
+        'nonlinear': False,
+        'xcorr_asymmetry': float('nan'),
+        'apparent_stiction': float('nan'),
+        'stiction_likely': False,
+    }
+
+
+def stiction_diagnosis(PV, SP, OP, period=None):
+    """Diagnóstico de agarre de la válvula de un lazo (vectores de N muestras).
+
+    `period` es el período de la oscilación dominante en muestras (o None). El registro se diezma;
+    la bicoherencia y los armónicos del error deciden si el lazo es no lineal, y la correlación
+    cruzada OP-error y el gráfico PV-OP indican si esa no linealidad es agarre de la válvula. Con
+    muestras no finitas (celdas vacías o con texto) no se emite diagnóstico.
+    """
+    if not all(np.isfinite(v).all() for v in (PV, SP, OP)):
+        return no_diagnosis()
+    factor = decimation_factor(len(PV), period)
+    PV, SP, OP = (decimate(v, factor) for v in (PV, SP, OP))
+    error = SP - PV
+    period = period / factor if period is not None else None
+    NGI, NLI = nonlinearity_indices(error)
+    distortion = harmonic_distortion(error, period)
+    nonlinear = bool((NGI > NGI_THRESHOLD and NLI > NLI_THRESHOLD) or distortion > HARMONIC_THRESHOLD)
+    asymmetry = xcorr_asymmetry(OP, error)
+    regulatory = bool(np.ptp(SP) <= SETPOINT_TOLERANCE * np.ptp(PV)) if len(PV) else False
+    return {
+        'NGI': NGI,
+        'NLI': NLI,
+        'harmonic_distortion': distortion,
+        'nonlinear': nonlinear,
+        'xcorr_asymmetry': asymmetry,
+        'apparent_stiction': apparent_stiction(PV, OP),
+        'stiction_likely': bool(regulatory and nonlinear and asymmetry > XCORR_ODD_THRESHOLD),
+    }
+
+
+def format_stiction(result):
+    """Líneas de texto con el diagnóstico de agarre de la válvula de un LoopAnalysis."""
+    if result.stiction_likely:
+        verdict = "Agarre de la válvula: probable (stiction)."
+    elif result.nonlinear:
+        verdict = "Agarre de la válvula: no indicado (el lazo es no lineal, pero la correlación cruzada OP-error es par)."
+    else:
+        verdict = "Agarre de la válvula: no detectado."
+    return [
+        verdict,
+        f"No gaussianidad (NGI): {result.NGI:.4g}   No linealidad (NLI): {result.NLI:.4g}   "
+        f"Distorsión armónica: {result.harmonic_distortion:.3g}",
+        f"Asimetría de la correlación cruzada OP-error: {result.xcorr_asymmetry:.3g}   "
+        f"Agarre aparente (PV-OP): {result.apparent_stiction:.4g}",
+    ]
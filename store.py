@@ -0,0 +1,159 @@
+import hashlib
+import io
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from loader import detect_separator
+from loop_analyzer import LoopAnalyzer
+from spectral import WELCH_NPERSEG
+from streaming import STREAM_CHUNKSIZE, STREAM_MAX_LAG, StreamingLoopStats, csv_layout, update_from_chunks
+
+# Bytes del comienzo del CSV y de antes del último punto procesado que deben seguir iguales
+FINGERPRINT_BYTES = 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS loop_state (
+    file TEXT NOT NULL,
+    loop TEXT NOT NULL,
+    n_rows INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    max_lag INTEGER NOT NULL,
+    nperseg INTEGER NOT NULL,
+    state BLOB NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (file, loop)
+)
+"""
+
+
+def file_fingerprint(file_name, offset):
+    """Huella de los bytes ya procesados: el comienzo del archivo y el tramo anterior a `offset`."""
+    digest = hashlib.sha1()
+    with open(file_name, 'rb') as f:
+        digest.update(f.read(min(offset, FINGERPRINT_BYTES)))
+        start = max(offset - FINGERPRINT_BYTES, 0)
+        f.seek(start)
+        digest.update(f.read(offset - start))
+    return digest.hexdigest()
+
+
+def _pack(stats):
+    buffer = io.BytesIO()
+    np.savez(buffer, **stats.state())
+    return buffer.getvalue()
+
+
+def _unpack(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as arrays:
+        return StreamingLoopStats.from_state({key: arrays[key] for key in arrays.files})
+
+
+class ResultStore:
+    """Base SQLite con los estadísticos suficientes de cada lazo, por archivo y lazo.
+
+    Guarda los acumuladores de streaming.StreamingLoopStats (sumas, momentos, IAE parciales,
+    sumas de la PSD de Welch y productos con desfase) y hasta dónde se leyó cada archivo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Varios procesos del análisis por lotes pueden escribir a la vez
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def load(self, file_name):
+        """{lazo: fila guardada} de un archivo; el estado ya viene reconstruido en 'stats'."""
+        rows = self.connection.execute(
+            'SELECT loop, n_rows, offset, fingerprint, max_lag, nperseg, state FROM loop_state WHERE file = ?',
+            (os.path.abspath(file_name),)).fetchall()
+        return {loop: {'n_rows': n_rows, 'offset': offset, 'fingerprint': fingerprint, 'max_lag': max_lag,
+                       'nperseg': nperseg, 'stats': _unpack(state)}
+                for loop, n_rows, offset, fingerprint, max_lag, nperseg, state in rows}
+
+    def save(self, file_name, stats, offset, fingerprint):
+        """Reemplaza el estado de todos los lazos de un archivo ({lazo: StreamingLoopStats})."""
+        file_name = os.path.abspath(file_name)
+        with self.connection:
+            self.connection.execute('DELETE FROM loop_state WHERE file = ?', (file_name,))
+            self.connection.executemany(
+                'INSERT INTO loop_state VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(file_name, tag, s.PV.n, offset, fingerprint, s.lags.max_lag, s.welch.nperseg, _pack(s), time.time())
+                 for tag, s in stats.items()])
+
+    def remove(self, file_name):
+        with self.connection:
+            self.connection.execute('DELETE FROM loop_state WHERE file = ?', (os.path.abspath(file_name),))
+
+
+def _resumable(saved, mapping, file_name, size, max_lag, nperseg):
+    # El estado sirve si tiene todos los lazos, los mismos parámetros y los bytes procesados no cambiaron
+    if set(saved) != set(mapping):
+        return False
+    offsets = {row['offset'] for row in saved.values()}
+    if len(offsets) != 1:
+        return False
+    offset = offsets.pop()
+    if offset > size or any(row['max_lag'] != max_lag or row['nperseg'] != nperseg for row in saved.values()):
+        return False
+    fingerprint = file_fingerprint(file_name, offset)
+    return all(row['fingerprint'] == fingerprint for row in saved.values())
+
+
+def analyze_csv_incremental(file_name, store, analyzer=None, sep=None, chunksize=STREAM_CHUNKSIZE,
+                            nperseg=WELCH_NPERSEG, progress=None):
+    """Analiza un CSV por bloques retomando los acumuladores guardados en `store`.
+
+    Si el archivo solo creció desde el último análisis, se leen únicamente las filas nuevas y se
+    suman a los acumuladores; el resultado es el mismo que el de streaming.analyze_csv_streaming
+    sobre el archivo completo. Devuelve ({tag: LoopAnalysis}, filas nuevas leídas).
+    """
+    if analyzer is None:
+        analyzer = LoopAnalyzer()
+    max_lag = analyzer.max_lag if analyzer.max_lag is not None else STREAM_MAX_LAG
+    sep = sep or detect_separator(file_name)
+    columns, mapping, used, dtype = csv_layout(file_name, sep)
+
+    size = os.path.getsize(file_name)
+    saved = store.load(file_name)
+    if saved and _resumable(saved, mapping, file_name, size, max_lag, nperseg):
+        stats = {tag: row['stats'] for tag, row in saved.items()}
+        offset = next(iter(saved.values()))['offset']
+    else:
+        stats = {tag: StreamingLoopStats(max_lag=max_lag, nperseg=nperseg, fs=analyzer.fs) for tag in mapping}
+        offset = 0
+
+    rows = 0
+    if offset < size:
+        with open(file_name, 'rb') as f:
+            if offset:
+                # Las filas agregadas no traen encabezado: se leen con los nombres de la primera línea
+                f.seek(offset)
+                reader = pd.read_csv(f, sep=sep, header=None, names=columns, usecols=used, dtype=dtype,
+                                     chunksize=chunksize)
+            else:
+                reader = pd.read_csv(f, sep=sep, usecols=used, dtype=dtype, chunksize=chunksize)
+            with reader:
+                rows = update_from_chunks(reader, stats, mapping, default_fs=analyzer.fs, progress=progress)
+            f.seek(size - 1)
+            complete = f.read(1) == b'\n'
+        # Si la última línea no terminó de escribirse no se puede retomar desde ahí
+        if complete:
+            store.save(file_name, stats, size, file_fingerprint(file_name, size))
+        else:
+            store.remove(file_name)
+    return {tag: s.result(analyzer) for tag, s in stats.items()}, rows
@@ -0,0 +1,307 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import fftconvolve, find_peaks, get_window
+
+from loader import detect_separator, loop_columns
+from loop_analyzer import LoopAnalysis, LoopAnalyzer
+from metrics import OSCILLATION_REGULARITY, harris_index, oscillation_index, time_values
+from multiloop import discover_loops
+from spectral import WELCH_NPERSEG, rank_oscillations, sampling_frequency
+from stiction import no_diagnosis
+
+# Filas leídas por bloque y tamaño de los acumuladores: la memoria no depende del largo del archivo
+STREAM_CHUNKSIZE = 100_000
+STREAM_MAX_LAG = 1000
+
+
+class RunningMoments:
+    """Media y suma de cuadrados centrada acumuladas por bloques (Welford / Chan)."""
+
+    def __init__(self, n=0, mean=0.0, M2=0.0):
+        self.n = n
+        self.mean = mean
+        self.M2 = M2
+
+    def update(self, x):
+        if len(x):
+            mean = float(np.mean(x))
+            deviation = x - mean
+            self.merge(RunningMoments(len(x), mean, float(np.dot(deviation, deviation))))
+
+    def merge(self, other):
+        n = self.n + other.n
+        if n == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.M2 += other.M2 + delta * delta * self.n * other.n / n
+        self.n = n
+
+    def variance(self, ddof=0):
+        return self.M2 / (self.n - ddof) if self.n > ddof else float('nan')
+
+
+class WelchAccumulator:
+    """Densidad espectral de potencia por el método de Welch, acumulada por bloques.
+
+    Equivale a scipy.signal.welch(x, fs, 'hann', nperseg, nperseg // 2) sobre la señal completa.
+    """
+
+    def __init__(self, nperseg=WELCH_NPERSEG, fs=1):
+        self.nperseg = nperseg
+        self.step = nperseg - nperseg // 2
+        self.fs = fs
+        self.window = get_window('hann', nperseg)
+        self.tail = np.zeros(0)
+        self.psd_sum = np.zeros(nperseg // 2 + 1)
+        self.n_segments = 0
+
+    def update(self, x):
+        buffer = np.concatenate((self.tail, x))
+        if len(buffer) < self.nperseg:
+            self.tail = buffer
+            return
+        segments = sliding_window_view(buffer, self.nperseg)[::self.step]
+        segments = (segments - segments.mean(axis=1, keepdims=True)) * self.window
+        self.psd_sum += np.sum(np.abs(np.fft.rfft(segments, axis=1)) ** 2, axis=0)
+        self.n_segments += len(segments)
+        self.tail = buffer[len(segments) * self.step:]
+
+    def frequencies(self):
+        return np.fft.rfftfreq(self.nperseg, d=1 / self.fs)
+
+    def psd(self):
+        if self.n_segments == 0:
+            return np.zeros_like(self.psd_sum)
+        psd = self.psd_sum / (self.n_segments * self.fs * np.sum(self.window ** 2))
+        # Espectro de un solo lado: se duplica todo salvo DC y Nyquist
+        psd[1:-1 if self.nperseg % 2 == 0 else None] *= 2
+        return psd
+
+
+class LagProductAccumulator:
+    """Sumas x[t] * x[t - k] para k = 0..max_lag, acumuladas por bloques.
+
+    Arrastra las últimas max_lag muestras, así que el resultado coincide exactamente con
+    np.correlate(x, x, mode='full') en esos desfases. Guarda también las primeras max_lag
+    muestras y la suma total, con las que se centran las sumas al final.
+    """
+
+    def __init__(self, max_lag=STREAM_MAX_LAG):
+        self.max_lag = max_lag
+        self.tail = np.zeros(0)
+        self.head = np.zeros(0)
+        self.n = 0
+        self.total = 0.0
+        self.sums = np.zeros(max_lag + 1)
+
+    def update(self, x):
+        if not len(x):
+            return
+        if len(self.head) < self.max_lag:
+            self.head = np.concatenate((self.head, x[:self.max_lag - len(self.head)]))
+        self.n += len(x)
+        self.total += float(np.sum(x))
+        buffer = np.concatenate((self.tail, x))
+        T, n = len(self.tail), len(x)
+        # full[T + n - 1 - k] = sum_j x[j] * buffer[T + j - k]
+        full = fftconvolve(buffer, x[::-1], mode='full')
+        lags = min(self.max_lag, T + n - 1)
+        self.sums[:lags + 1] += full[T + n - 1 - np.arange(lags + 1)]
+        self.tail = buffer[-self.max_lag:] if self.max_lag else np.zeros(0)
+
+    def acf(self, n):
+        r = self.sums / n
+        time_lags = np.arange(-self.max_lag, self.max_lag + 1)
+        return time_lags, np.concatenate((r[:0:-1], r))
+
+    def centered(self):
+        """Autocovarianza de x - media(x) para k = 0..max_lag, igual que acf.autocovariance."""
+        n, mean = self.n, self.total / self.n if self.n else 0.0
+        k = np.arange(min(self.max_lag, n - 1) + 1)
+        # sum((x[t] - m) * (x[t - k] - m)) = S_k - m * (sumas de x sin las primeras / últimas k) + (n - k) m²
+        head = np.concatenate(([0.0], np.cumsum(self.head)))[k]
+        tail = np.concatenate(([0.0], np.cumsum(self.tail[::-1])))[k]
+        return (self.sums[k] - mean * (2 * self.total - head - tail) + (n - k) * mean * mean) / max(n, 1)
+
+
+class StreamingLoopStats:
+    """Acumula IAE, momentos de PV/OP, PSD de Welch, ACF de PV e índices de desempeño en memoria acotada.
+
+    La autocovarianza del error (índices de Harris y de oscilación) también se limita a max_lag.
+    """
+    # Acumuladores que componen el estado, con su clase
+    _PARTS = {'PV': RunningMoments, 'OP': RunningMoments, 'welch': WelchAccumulator,
+              'lags': LagProductAccumulator, 'error_lags': LagProductAccumulator}
+
+    def __init__(self, max_lag=STREAM_MAX_LAG, nperseg=WELCH_NPERSEG, fs=1):
+        self.IAE = 0.0
+        self.ITAE = 0.0
+        self.PV = RunningMoments()
+        self.OP = RunningMoments()
+        self.welch = WelchAccumulator(nperseg, fs)
+        self.lags = LagProductAccumulator(max_lag)
+        self.error_lags = LagProductAccumulator(max_lag)
+        # Arrastre entre bloques: primer instante, última OP y último sentido de movimiento de la válvula
+        self.t0 = float('nan')
+        self.last_OP = float('nan')
+        self.last_direction = 0.0
+        self.valve_travel = 0.0
+        self.valve_reversals = 0
+
+    def update(self, PV, SP, OP, time=None):
+        PV = np.asarray(PV, dtype=np.float64)
+        OP = np.asarray(OP, dtype=np.float64)
+        error = np.asarray(SP, dtype=np.float64) - PV
+        absolute_error = np.abs(error)
+        self.IAE += float(np.sum(absolute_error))
+        t = time_values(time)
+        if t is None or len(t) != len(PV):
+            t = np.arange(self.PV.n, self.PV.n + len(PV)) / self.welch.fs
+        if np.isnan(self.t0) and len(t):
+            self.t0 = t[0]
+        self.ITAE += float(np.dot(t - self.t0, absolute_error)) if len(t) else 0.0
+        self.PV.update(PV)
+        self.OP.update(OP)
+        self.welch.update(PV)
+        self.lags.update(PV)
+        self.error_lags.update(error)
+        self._update_valve(OP)
+
+    def _update_valve(self, OP):
+        if not len(OP):
+            return
+        steps = np.diff(OP if np.isnan(self.last_OP) else np.concatenate(([self.last_OP], OP)))
+        self.valve_travel += float(np.sum(np.abs(steps)))
+        directions = np.sign(steps)
+        directions = np.concatenate(([self.last_direction], directions[directions != 0]))
+        directions = directions[directions != 0]
+        self.valve_reversals += int(np.count_nonzero(np.diff(directions)))
+        if len(directions):
+            self.last_direction = directions[-1]
+        self.last_OP = OP[-1]
+
+    def state(self):
+        """Todo el estado acumulado como {nombre: arreglo}, para guardarlo y seguir acumulando después."""
+        state = {name: np.asarray(value) for name, value in vars(self).items() if name not in self._PARTS}
+        for part in self._PARTS:
+            state.update({f'{part}.{name}': np.asarray(value) for name, value in vars(getattr(self, part)).items()})
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """Reconstruye los acumuladores guardados con state()."""
+        stats = cls.__new__(cls)
+        for part, part_class in cls._PARTS.items():
+            setattr(stats, part, part_class.__new__(part_class))
+        for key, value in state.items():
+            value = np.asarray(value)
+            value = value.item() if value.ndim == 0 else value
+            owner, _, name = key.rpartition('.')
+            setattr(getattr(stats, owner) if owner else stats, name, value)
+        return stats
+
+    def result(self, analyzer):
+        n = self.PV.n
+        power_spectrum = self.welch.psd()
+        peaks, _ = find_peaks(power_spectrum, distance=analyzer.peak_distance)
+        psd_frequencies = self.welch.frequencies()
+        peak_frequencies = psd_frequencies[peaks]
+        peak_amplitudes = np.sqrt(power_spectrum[peaks])
+        time_lags, acf = self.lags.acf(n)
+        acf_max = float(np.max(acf)) if n else float('nan')
+        error_autocovariance = self.error_lags.centered()
+        regularity, period = oscillation_index(error_autocovariance, fs=self.welch.fs)
+
+        return LoopAnalysis(
+            n_samples=n,
+            IAE=self.IAE,
+            IAElim=analyzer.IAElim,
+            oscillating_IAE=bool(self.IAE > analyzer.IAElim),
+            mean_PV=self.PV.mean,
+            mean_OP=self.OP.mean,
+            std_PV=float(np.sqrt(self.PV.variance())),
+            std_OP=float(np.sqrt(self.OP.variance())),
+            covariance_PV=self.PV.variance(ddof=1),
+            covariance_OP=self.OP.variance(ddof=1),
+            # El error absoluto completo no se conserva en modo streaming
+            absolute_error=np.zeros(0),
+            power_spectrum=power_spectrum,
+            peaks=peaks,
+            peak_frequencies=peak_frequencies,
+            peak_amplitudes=peak_amplitudes,
+            mean_frequency=float(np.mean(peak_frequencies)) if len(peaks) else float('nan'),
+            mean_amplitude=float(np.mean(peak_amplitudes)) if len(peaks) else float('nan'),
+            fs=self.welch.fs,
+            psd_frequencies=psd_frequencies,
+            psd=power_spectrum,
+            oscillations=rank_oscillations(psd_frequencies, power_spectrum),
+            time_lags=time_lags,
+            acf=acf,
+            acf_max=acf_max,
+            umbral_acf=analyzer.umbral_acf,
+            perturbations_ACF=bool(acf_max > analyzer.umbral_acf),
+            # La suma de productos con desfase 0 es la suma de errores al cuadrado
+            ISE=float(self.error_lags.sums[0]),
+            ITAE=self.ITAE,
+            IAE_per_sample=self.IAE / n if n else float('nan'),
+            harris_index=float(harris_index(error_autocovariance, delay=analyzer.harris_delay,
+                                            order=analyzer.harris_order)[0]),
+            oscillation_index=float(regularity[0]),
+            oscillation_period=float(period[0]),
+            regular_oscillation=bool(regularity[0] > OSCILLATION_REGULARITY),
+            valve_travel=self.valve_travel,
+            valve_reversals=self.valve_reversals,
+            # El diagnóstico de agarre necesita las señales completas, que no se conservan en modo streaming
+            **no_diagnosis(),
+        )
+
+
+def csv_layout(file_name, sep):
+    """Columnas de un CSV leídas del encabezado: (todas, lazos como en discover_loops, usadas, dtype)."""
+    columns = list(pd.read_csv(file_name, sep=sep, nrows=0).columns)
+    mapping = discover_loops(columns)
+    if not mapping:
+        raise ValueError("No se encontraron columnas PV, SP y OP en el archivo.")
+    dtype = {column: np.float64 for variables in mapping.values() for column in variables.values()}
+    return columns, mapping, loop_columns(columns), dtype
+
+
+def analyze_csv_streaming(file_name, analyzer=None, sep=None, chunksize=STREAM_CHUNKSIZE,
+                          nperseg=WELCH_NPERSEG, progress=None):
+    """Analiza un CSV por bloques sin cargarlo completo en memoria; devuelve {tag: LoopAnalysis}.
+
+    Los lazos se reconocen como en multiloop.discover_loops. La ACF se limita a analyzer.max_lag
+    (o STREAM_MAX_LAG) y el espectro es la PSD de Welch.
+    """
+    if analyzer is None:
+        analyzer = LoopAnalyzer()
+    max_lag = analyzer.max_lag if analyzer.max_lag is not None else STREAM_MAX_LAG
+    sep = sep or detect_separator(file_name)
+    _, mapping, used, dtype = csv_layout(file_name, sep)
+    stats = {tag: StreamingLoopStats(max_lag=max_lag, nperseg=nperseg, fs=analyzer.fs) for tag in mapping}
+
+    with pd.read_csv(file_name, sep=sep, usecols=used, dtype=dtype, chunksize=chunksize) as reader:
+        update_from_chunks(reader, stats, mapping, default_fs=analyzer.fs, progress=progress)
+    return {tag: s.result(analyzer) for tag, s in stats.items()}
+
+
+def update_from_chunks(chunks, stats, mapping, default_fs=1, progress=None):
+    """Pasa bloques de un CSV a los acumuladores de cada lazo y devuelve las filas leídas.
+
+    `stats` es {tag: StreamingLoopStats} y `mapping` tiene la forma de multiloop.discover_loops.
+    """
+    rows = 0
+    for chunk in chunks:
+        time = chunk['Time'].values if 'Time' in chunk else None
+        for tag, columns in mapping.items():
+            if stats[tag].PV.n == 0 and time is not None:
+                # La PSD acumulada no depende de fs: basta con fijarla antes de pedir el resultado
+                stats[tag].welch.fs = sampling_frequency(time, default=default_fs)
+            stats[tag].update(chunk[columns['PV']].values, chunk[columns['SP']].values,
+                              chunk[columns['OP']].values, time=time)
+        rows += len(chunk)
+        if progress is not None:
+            progress(f"{rows} muestras procesadas...")
+    return rows
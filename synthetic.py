@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter, sawtooth
+
+KINDS = ('step', 'oscillation', 'noise', 'stiction')
+
+
+def _first_order(u, tau):
+    # Proceso de primer orden discreto: y[k] = a * y[k-1] + (1 - a) * u[k]
+    a = np.exp(-1 / tau)
+    return lfilter([1 - a], [1, -a], u)
+
+
+def generate_loop(kind, N, seed=0, period=200, noise=0.05):
+    """Lazo sintético con columnas Time/PV/SP/OP/Error.
+
+    kind: 'step' (respuesta a escalones de SP), 'oscillation' (oscilación senoidal),
+    'noise' (solo ruido alrededor de SP) o 'stiction' (ciclo límite por fricción de válvula:
+    OP triangular y PV casi cuadrada).
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(N, dtype=np.float64)
+    phase = 2 * np.pi * t / period
+
+    if kind == 'step':
+        SP = np.where((t // (period * 5)) % 2 == 0, 1.0, 2.0)
+        PV = _first_order(SP, tau=period / 10)
+        OP = SP + 0.5 * (SP - PV)
+    elif kind == 'oscillation':
+        SP = np.ones(N)
+        OP = 1 + 0.3 * np.sin(phase)
+        PV = 1 + 0.5 * np.sin(phase - np.pi / 4)
+    elif kind == 'noise':
+        SP = np.ones(N)
+        PV = SP.copy()
+        OP = 0.5 * np.ones(N)
+    elif kind == 'stiction':
+        SP = np.ones(N)
+        OP = 1 + 0.4 * sawtooth(phase, width=0.5)
+        # La válvula salta en los extremos de OP: PV sube cuando OP deja de subir y viceversa
+        PV = 1 - 0.5 * np.tanh(10 * np.sin(phase))
+    else:
+        raise ValueError(f"Tipo de lazo desconocido: {kind}")
+
+    PV = PV + rng.normal(0, noise, N)
+    return pd.DataFrame({'Time': t, 'PV': PV, 'SP': SP, 'OP': OP, 'Error': SP - PV})
@@ -0,0 +1,29 @@
+import numpy as np
+
+from loop_analyzer import LoopAnalyzer
+from streaming import analyze_csv_streaming
+from synthetic import generate_loop
+
+
+def _loop_with_gap():
+    # Una celda vacía o con texto en la exportación llega al análisis como NaN
+    data = generate_loop('oscillation', 1000)
+    data.loc[0, 'PV'] = np.nan
+    data.loc[5, 'OP'] = np.nan
+    return data
+
+
+def test_analyze_with_nan():
+    result = LoopAnalyzer().analyze(_loop_with_gap())
+    assert result.n_samples == 1000
+    assert not result.oscillating_IAE and not result.perturbations_ACF
+    assert np.isnan(result.harris_index) and np.isnan(result.oscillation_index)
+    assert np.isnan(result.NGI) and not result.stiction_likely
+
+
+def test_analyze_csv_streaming_with_nan(tmp_path):
+    file_name = str(tmp_path / 'lazo.csv')
+    _loop_with_gap().to_csv(file_name, sep=';', index=False)
+    result = analyze_csv_streaming(file_name)['']
+    assert result.n_samples == 1000
+    assert np.isnan(result.harris_index) and np.isnan(result.oscillation_index)
@@ -0,0 +1,106 @@
+import importlib
+import threading
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from instrumentation import StageProfiler
+
+
+# Módulos pesados que las interfaces importan en segundo plano apenas aparece la ventana
+ANALYSIS_MODULES = ('loader', 'loop_analyzer', 'plotting')
+
+
+class AnalysisCancelled(Exception):
+    pass
+
+
+class AnalysisWorker(QObject):
+    """Carga un archivo y ejecuta LoopAnalyzer fuera del hilo de la interfaz."""
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(object, object)  # (data, result)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, file_name, read_file, analyzer, profiler=None):
+        super().__init__()
+        self.file_name = file_name
+        self.read_file = read_file
+        self.analyzer = analyzer
+        self.profiler = profiler if profiler is not None else StageProfiler()
+        self._cancelled = False
+
+    def cancel(self):
+        # La cancelación es cooperativa: se atiende entre etapas y cada tanto durante la lectura
+        self._cancelled = True
+
+    def _raise_if_cancelled(self):
+        if self._cancelled:
+            raise AnalysisCancelled()
+
+    def _check(self, message):
+        self._raise_if_cancelled()
+        self.progress.emit(message)
+
+    def _progress(self, message):
+        self._check(message)
+        self.profiler.on_progress(message)
+
+    def run(self):
+        try:
+            self._check(f"Cargando {self.file_name}...")
+            with self.profiler.stage('load'):
+                data = self.read_file(self.file_name, check=self._raise_if_cancelled)
+            self._check("Datos cargados correctamente:")
+            self.progress.emit(str(data.head()))
+            result = self.analyzer.analyze(data, progress=self._progress)
+            self.profiler.stop()
+            self._check("Análisis completado.")
+        except AnalysisCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(data, result)
+
+
+def start_worker(owner, worker):
+    """Mueve `worker` a un QThread propio y lo inicia; devuelve el hilo."""
+    thread = QThread(owner)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    for signal in (worker.finished, worker.failed, worker.cancelled):
+        signal.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    thread.finished.connect(thread.deleteLater)
+    thread.start()
+    return thread
+
+
+def stop_worker(worker, thread):
+    """Cancela el análisis en curso y espera a que su hilo termine (antes de cerrar la ventana dueña)."""
+    if worker is not None:
+        worker.cancel()
+    if thread is None:
+        return
+    try:
+        if thread.isRunning():
+            thread.quit()
+            thread.wait()
+    except RuntimeError:
+        # El hilo ya había terminado y Qt lo destruyó (deleteLater)
+        pass
+
+
+def preload_modules(modules=ANALYSIS_MODULES):
+    """Importa los módulos en un hilo aparte; un import posterior desde otro hilo espera y los reutiliza."""
+    def run():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                # El error se informa cuando el módulo se importa para usarlo
+                pass
+
+    thread = threading.Thread(target=run, name='preload', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,113 @@
+import math
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Archivos analizados que se mantienen en memoria; al superar el límite se descarta el menos usado
+WORKSPACE_SIZE = 8
+
+# Filas de la tabla comparativa: (etiqueta, clave de LoopAnalysis.summary())
+COMPARISON_METRICS = (
+    ("Muestras", 'n_samples'),
+    ("IAE", 'IAE'),
+    ("Oscilación (IAE)", 'oscillating_IAE'),
+    ("Media de PV", 'mean_PV'),
+    ("Media de OP", 'mean_OP'),
+    ("Desv. estándar de PV", 'std_PV'),
+    ("Desv. estándar de OP", 'std_OP'),
+    ("Covarianza de PV", 'covariance_PV'),
+    ("Covarianza de OP", 'covariance_OP'),
+    ("ACF máxima", 'acf_max'),
+    ("Perturbaciones (ACF)", 'perturbations_ACF'),
+    ("Período dominante", 'dominant_period'),
+    ("ISE", 'ISE'),
+    ("ITAE", 'ITAE'),
+    ("IAE por muestra", 'IAE_per_sample'),
+    ("Índice de Harris", 'harris_index'),
+    ("Índice de oscilación", 'oscillation_index'),
+    ("Recorrido de la válvula", 'valve_travel'),
+    ("Cambios de sentido de la válvula", 'valve_reversals'),
+    ("No linealidad (NLI)", 'NLI'),
+    ("Distorsión armónica", 'harmonic_distortion'),
+    ("Agarre aparente (PV-OP)", 'apparent_stiction'),
+    ("Agarre de válvula", 'stiction_likely'),
+)
+
+
+def file_signature(file_name):
+    """Tamaño y fecha de modificación: si cambian, el archivo se vuelve a leer y analizar."""
+    stat = os.stat(file_name)
+    return stat.st_size, stat.st_mtime_ns
+
+
+@dataclass
+class WorkspaceEntry:
+    """Un archivo ya leído y analizado."""
+    file_name: str
+    data: object
+    result: object
+    signature: tuple
+
+    @property
+    def label(self):
+        return os.path.basename(self.file_name)
+
+
+class Workspace:
+    """Archivos analizados en memoria, con descarte del menos usado recientemente (LRU)."""
+
+    def __init__(self, max_entries=WORKSPACE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, file_name):
+        return file_name in self._entries
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def add(self, file_name, data, result):
+        """Agrega (o reemplaza) un archivo y devuelve los nombres de los archivos descartados."""
+        self._entries.pop(file_name, None)
+        self._entries[file_name] = WorkspaceEntry(file_name, data, result, file_signature(file_name))
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted.append(self._entries.popitem(last=False)[0])
+        return evicted
+
+    def get(self, file_name):
+        """Entrada del archivo (marcándola como usada), o None si no está."""
+        if file_name not in self._entries:
+            return None
+        self._entries.move_to_end(file_name)
+        return self._entries[file_name]
+
+    def is_current(self, file_name):
+        """True si el archivo está en memoria y no cambió en disco desde que se analizó."""
+        entry = self._entries.get(file_name)
+        try:
+            return entry is not None and entry.signature == file_signature(file_name)
+        except OSError:
+            return False
+
+    def remove(self, file_name):
+        self._entries.pop(file_name, None)
+
+
+def _format_metric(value):
+    if isinstance(value, bool):
+        return "Sí" if value else "No"
+    if isinstance(value, float):
+        return "-" if math.isnan(value) else f"{value:.6g}"
+    return str(value)
+
+
+def comparison_table(entries):
+    """Tabla de métricas lado a lado: (encabezados, [(etiqueta, [valor por archivo])])."""
+    summaries = [entry.result.summary() for entry in entries]
+    rows = [(label, [_format_metric(summary[key]) for summary in summaries])
+            for label, key in COMPARISON_METRICS]
+    return [entry.label for entry in entries], rows